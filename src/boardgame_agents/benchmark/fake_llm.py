@@ -0,0 +1,107 @@
+import os
+import time
+import asyncio
+import hashlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+
+ANSWERS = [
+    "Each player draws two cards at the start of their turn.",
+    "The game ends when the last round is complete; the highest score wins.",
+    "Set up the board, shuffle the deck and deal five cards to every player.",
+    "You may take exactly one action per turn, then pass to the left.",
+    "Ties are broken by the number of remaining resources.",
+]
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline stand-in for the OpenRouter model.
+
+    The answer is picked from `ANSWERS` by a hash of the prompt, so the same
+    input always gives the same output. A call takes `latency` seconds before
+    the first token, and streamed words arrive at `tokens_per_second`.
+    """
+
+    latency: float = FAKE_LLM_LATENCY
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        digest = int(hashlib.sha1(prompt.encode("utf-8")).hexdigest(), 16)
+        return ANSWERS[digest % len(ANSWERS)]
+
+    def _words(self, messages: List[BaseMessage]) -> List[str]:
+        words = self._answer(messages).split(" ")
+        return [w if i == 0 else f" {w}" for i, w in enumerate(words)]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        words = self._words(messages)
+        time.sleep(self.latency + self._token_delay() * len(words))
+        message = AIMessage(content="".join(words))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        words = self._words(messages)
+        await asyncio.sleep(self.latency + self._token_delay() * len(words))
+        message = AIMessage(content="".join(words))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for word in self._words(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+            time.sleep(self._token_delay())
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for word in self._words(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self._token_delay())
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+from src.boardgame_agents.benchmark.seed import BENCHMARK_BACKUP, InProcessVectorStore
+from src.boardgame_agents.benchmark.run_benchmark import make_questions
+from src.boardgame_agents.rag.model_registry import (
+    CROSS_ENCODER_MODEL,
+    EMBED_MODEL,
+    get_cross_encoder,
+    get_embeddings,
+    model_stats,
+)
+
+
+# share of the fp32 top-k a quantized ranking has to keep
+QUANTIZATION_TOLERANCE = float(os.getenv("QUANTIZATION_TOLERANCE", "0.9"))
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {"p50_ms": round(float(p50) * 1000, 2), "p95_ms": round(float(p95) * 1000, 2)}
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values)] = np.arange(len(values))
+    return ranks
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    if len(a) < 2:
+        return 1.0
+    return float(np.corrcoef(_ranks(a), _ranks(b))[0, 1])
+
+
+def top_k_overlap(reference: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    return len(set(np.argsort(-reference)[:k]) & set(np.argsort(-candidate)[:k])) / k
+
+
+def compare_embeddings(texts: List[str], questions: List[str], backend: str, k: int) -> Dict:
+    """Retrieval over the corpus with fp32 torch vs `backend` embeddings."""
+    reference, candidate = get_embeddings(EMBED_MODEL, "torch"), get_embeddings(EMBED_MODEL, backend)
+
+    def normed(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+    docs_ref, docs_cand = normed(reference.embed_documents(texts)), normed(candidate.embed_documents(texts))
+
+    overlaps, cosines, latency = [], [], {"torch": [], backend: []}
+    for question in questions:
+        vectors = {}
+        for name, model in (("torch", reference), (backend, candidate)):
+            start = time.perf_counter()
+            vectors[name] = normed(model.embed_query(question))
+            latency[name].append(time.perf_counter() - start)
+        cosines.append(float(vectors["torch"] @ vectors[backend]))
+        overlaps.append(top_k_overlap(docs_ref @ vectors["torch"], docs_cand @ vectors[backend], k))
+
+    return {
+        f"top{k}_overlap": round(float(np.mean(overlaps)), 4),
+        "query_cosine_mean": round(float(np.mean(cosines)), 4),
+        "document_cosine_mean": round(float(np.mean(np.sum(docs_ref * docs_cand, axis=1))), 4),
+        "latency": {name: _percentiles(values) for name, values in latency.items()},
+        "passed": float(np.mean(overlaps)) >= QUANTIZATION_TOLERANCE,
+    }
+
+
+def compare_cross_encoders(
+    store: InProcessVectorStore, questions: List[str], backend: str, initial_k: int, final_k: int
+) -> Dict:
+    """Rerank the fp32 retrieval candidates with fp32 torch vs `backend` scores."""
+    reference = get_cross_encoder(CROSS_ENCODER_MODEL, "torch")
+    candidate = get_cross_encoder(CROSS_ENCODER_MODEL, backend)
+    embeddings = get_embeddings(EMBED_MODEL, "torch")
+
+    correlations, overlaps, latency = [], [], {"torch": [], backend: []}
+    for question in questions:
+        docs = store.search(embeddings.embed_query(question), initial_k)
+        pairs = [(question, d.page_content) for d in docs]
+        scores = {}
+        for name, model in (("torch", reference), (backend, candidate)):
+            start = time.perf_counter()
+            scores[name] = np.asarray(model.predict(pairs))
+            latency[name].append(time.perf_counter() - start)
+        correlations.append(spearman(scores["torch"], scores[backend]))
+        overlaps.append(top_k_overlap(scores["torch"], scores[backend], min(final_k, len(docs))))
+
+    return {
+        "spearman_mean": round(float(np.mean(correlations)), 4),
+        f"top{final_k}_overlap": round(float(np.mean(overlaps)), 4),
+        "latency": {name: _percentiles(values) for name, values in latency.items()},
+        "passed": float(np.mean(overlaps)) >= QUANTIZATION_TOLERANCE,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check a quantized backend against the fp32 models on the chunks corpus")
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--backup", default=BENCHMARK_BACKUP)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--initial-k", type=int, default=20)
+    parser.add_argument("--final-k", type=int, default=2)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    store = InProcessVectorStore(args.backup)
+    questions = [q for _, q in make_questions(store, args.questions)]
+
+    report = {
+        "backend": args.backend,
+        "tolerance": QUANTIZATION_TOLERANCE,
+        "embeddings": compare_embeddings(
+            [d.page_content for d in store.documents], questions, args.backend, args.k),
+        "cross_encoder": compare_cross_encoders(
+            store, questions, args.backend, args.initial_k, args.final_k),
+        # load time, parameter bytes and RSS growth per model and backend
+        "models": model_stats(),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not (report["embeddings"]["passed"] and report["cross_encoder"]["passed"]):
+        sys.exit(1)
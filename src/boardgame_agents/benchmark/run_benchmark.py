@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import resource
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.boardgame_agents.benchmark.seed import (
+    BENCHMARK_BACKUP,
+    BENCHMARK_DSN,
+    InProcessRetriever,
+    InProcessVectorStore,
+    check_benchmark_dsn,
+    seed_postgres,
+)
+
+
+BENCHMARK_BASELINE = os.getenv("BENCHMARK_BASELINE", "benchmark_baseline.json")
+# relative slack before a metric counts as a regression
+BENCHMARK_TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", "0.15"))
+
+# never one of the measured questions, so warming up caches nothing they hit
+WARMUP_QUESTION = "How do you set up the game?"
+
+LATENCY_METRICS = ("p50_seconds", "p95_seconds", "p99_seconds")
+THROUGHPUT_METRICS = ("qps",)
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def summarize(latencies: Sequence[float], wall_seconds: float, **extra: Any) -> Dict[str, Any]:
+    values = np.asarray(latencies, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if len(values) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(values),
+        "mean_seconds": round(float(values.mean()), 4) if len(values) else 0.0,
+        "p50_seconds": round(float(p50), 4),
+        "p95_seconds": round(float(p95), 4),
+        "p99_seconds": round(float(p99), 4),
+        "qps": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+        "rss_bytes": rss_bytes(),
+        "peak_rss_bytes": peak_rss_bytes(),
+        **extra,
+    }
+
+
+async def run_async_load(
+    call: Callable[[Any], Awaitable[Any]], payloads: Sequence[Any], concurrency: int
+) -> Tuple[List[float], float]:
+    """Run `call` over `payloads` with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(payload):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(payload)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in payloads))
+    return latencies, time.perf_counter() - start
+
+
+def run_thread_load(
+    call: Callable[[Any], Any], payloads: Sequence[Any], concurrency: int
+) -> Tuple[List[float], float]:
+    def one(payload):
+        start = time.perf_counter()
+        call(payload)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, payloads))
+    return latencies, time.perf_counter() - start
+
+
+def make_questions(store: InProcessVectorStore, n: int) -> List[Tuple[str, str]]:
+    """Deterministic (game, question) pairs built from the dumped chunks."""
+    questions = []
+    for i in range(n):
+        doc = store.documents[i % len(store.documents)]
+        words = doc.page_content.split()
+        offset = (i // len(store.documents)) * 8 % max(len(words) - 8, 1)
+        snippet = " ".join(words[offset: offset + 8])
+        questions.append((doc.metadata.get("document_name", ""), f"What does this mean: {snippet}?"))
+    return questions
+
+
+def bench_chat(questions: List[Tuple[str, str]], concurrency: int, url: Optional[str] = None) -> Dict[str, Any]:
+    """Load /boardgame_rag/chat, in process through ASGI unless `url` is given.
+
+    Nothing is written to rag_chat_history: in process the history store
+    stays in memory, and a remote server gets no user_id at all. The
+    semantic answer cache is disabled in process; a remote server keeps its
+    own, so the answer cache hits during the run are reported either way.
+    """
+    import httpx
+
+    async def main():
+        if url:
+            client = httpx.AsyncClient(base_url=url, timeout=120)
+        else:
+            import src.main as app_module
+            from src.boardgame_agents.rag.rag_oop import RAGService
+
+            app_module.rag_service = RAGService()
+            app_module.rag_service.chat_histories.persist = False
+            # cosine similarity never exceeds 1, so every lookup misses
+            app_module.rag_service.answer_cache.threshold = float("inf")
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app_module.app),
+                base_url="http://benchmark", timeout=120)
+
+        async def call(item):
+            game_name, question = item
+            params = {"user_input": question, "game_name": game_name}
+            if not url:
+                # fresh in-memory users, so every request is a first turn
+                params["user_id"] = uuid.uuid4().hex
+            response = await client.get("/boardgame_rag/chat", params=params)
+            response.raise_for_status()
+
+        async def cache_hits() -> int:
+            response = await client.get("/boardgame_rag/cache_stats")
+            response.raise_for_status()
+            return response.json()["answer_cache"]["hits"]
+
+        async with client:
+            # first request pays for lazy chain and model setup
+            await call((questions[0][0], WARMUP_QUESTION))
+            hits_before = await cache_hits()
+            latencies, wall = await run_async_load(call, questions, concurrency)
+            return latencies, wall, await cache_hits() - hits_before
+
+    latencies, wall, hits = asyncio.run(main())
+    return summarize(latencies, wall, concurrency=concurrency, answer_cache_hits=hits)
+
+
+def bench_rerank(
+    store: InProcessVectorStore, questions: List[Tuple[str, str]], concurrency: int, initial_k: int = 5
+) -> Dict[str, Any]:
+    """Cross-encoder scoring of retrieved candidates, pair cache disabled."""
+    from src.boardgame_agents.rag.model_registry import CROSS_ENCODER_MODEL, EMBED_MODEL, get_embeddings
+    from src.boardgame_agents.rag.rerank_service import RerankEngine
+
+    embeddings = get_embeddings(EMBED_MODEL)
+    candidates = [
+        (question, InProcessRetriever(
+            store=store, embeddings=embeddings, k=initial_k, game_name=game_name).invoke(question))
+        for game_name, question in questions
+    ]
+
+    engine = RerankEngine(CROSS_ENCODER_MODEL, cache_size=0)
+    engine.score(*candidates[0])
+    latencies, wall = run_thread_load(lambda c: engine.score(*c), candidates, concurrency)
+    return summarize(latencies, wall, concurrency=concurrency, **engine.stats())
+
+
+def bench_ingest(
+    store: InProcessVectorStore, batch_size: int, dsn: Optional[str] = None
+) -> Dict[str, Any]:
+    """Embed the dumped chunks in batches and, with a DSN, COPY them into a scratch collection."""
+    # web_agent modules import their siblings by bare name
+    sys.path.append(str(Path(__file__).resolve().parents[1] / "web_agent"))
+    from src.boardgame_agents.rag.model_registry import EMBED_MODEL, get_embeddings
+
+    embeddings = get_embeddings(EMBED_MODEL, encode_kwargs={"batch_size": batch_size})
+    docs = store.documents
+    batches = [docs[i: i + batch_size] for i in range(0, len(docs), batch_size)]
+
+    conn = cur = collection_id = None
+    if dsn:
+        import psycopg2
+        from bulk_ingest import copy_chunks, get_or_create_collection
+
+        conn = psycopg2.connect(check_benchmark_dsn(dsn))
+        cur = conn.cursor()
+        collection_id = get_or_create_collection(cur, "benchmark_chunks")
+
+    def call(batch):
+        vectors = embeddings.embed_documents([d.page_content for d in batch])
+        if cur is not None:
+            # fresh ids so repeated batches never collide
+            copy_chunks(cur, collection_id,
+                        [d.model_copy(update={"id": str(uuid.uuid4())}) for d in batch], vectors)
+
+    try:
+        latencies, wall = run_thread_load(call, batches, 1)
+    finally:
+        if conn is not None:
+            cur.execute("DELETE FROM langchain_pg_collection WHERE uuid = %s", (collection_id,))
+            conn.commit()
+            conn.close()
+
+    result = summarize(latencies, wall, batch_size=batch_size)
+    result["chunks_per_second"] = round(len(docs) / wall, 2) if wall else 0.0
+    return result
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float = BENCHMARK_TOLERANCE
+) -> List[str]:
+    """Return one line per metric that got worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        for metric in LATENCY_METRICS:
+            if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{scenario}.{metric}: {previous[metric]} -> {current[metric]}")
+        for metric in THROUGHPUT_METRICS:
+            if previous.get(metric) and current[metric] < previous[metric] * (1 - tolerance):
+                regressions.append(f"{scenario}.{metric}: {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def run_benchmarks(args) -> Dict[str, Dict[str, Any]]:
+    if args.fake_llm:
+        os.environ["LLM_MODEL"] = "fake"
+    if args.seed:
+        seed_postgres(args.dsn, args.backup)
+
+    store = InProcessVectorStore(args.backup)
+    questions = make_questions(store, args.requests)
+
+    results = {}
+    for scenario in args.scenarios:
+        print(f"Running {scenario} ...")
+        if scenario == "chat":
+            results[scenario] = bench_chat(questions, args.concurrency, args.url)
+        elif scenario == "rerank":
+            results[scenario] = bench_rerank(store, questions, args.concurrency)
+        elif scenario == "ingest":
+            results[scenario] = bench_ingest(store, args.batch_size, args.dsn if args.write else None)
+        print(json.dumps(results[scenario], indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline latency / throughput benchmarks")
+    parser.add_argument("--scenarios", default="chat,rerank,ingest",
+                        type=lambda s: [x.strip() for x in s.split(",") if x.strip()])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--url", default=None, help="benchmark a running server instead of in process")
+    parser.add_argument("--dsn", default=BENCHMARK_DSN,
+                        help="benchmark Postgres for --seed/--write (BENCHMARK_DSN); never DB_DSN")
+    parser.add_argument("--backup", default=BENCHMARK_BACKUP)
+    parser.add_argument("--seed", action="store_true", help="load backup.sql into --dsn first")
+    parser.add_argument("--write", action="store_true", help="COPY ingested chunks into --dsn")
+    parser.add_argument("--real-llm", dest="fake_llm", action="store_false")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"Saved baseline to {baseline_path}")
+    elif baseline_path.exists():
+        regressions = compare_to_baseline(
+            results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
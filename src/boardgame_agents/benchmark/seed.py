@@ -0,0 +1,170 @@
+import os
+import io
+import re
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+from psycopg2.extensions import parse_dsn
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from src.boardgame_agents.rag.db_utils import PG_DSN
+
+
+# seeding drops the LangChain tables, so it never defaults to the app's DB_DSN
+BENCHMARK_DSN = os.getenv("BENCHMARK_DSN", "")
+BENCHMARK_BACKUP = os.getenv(
+    "BENCHMARK_BACKUP", str(Path(__file__).resolve().parents[3] / "backup.sql"))
+
+COPY_START = re.compile(r"^COPY (\S+) \(([^)]*)\) FROM stdin;$")
+COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+
+
+def _unescape(field: str) -> Optional[str]:
+    """Undo COPY text-format escaping for one column."""
+    if field == "\\N":
+        return None
+    return re.sub(r"\\(.)", lambda m: COPY_ESCAPES.get(m.group(1), m.group(1)), field)
+
+
+def iter_backup(path: str = BENCHMARK_BACKUP) -> Iterator[Tuple[str, object]]:
+    """Yield ("sql", statement) and ("copy", (table, columns, raw data)) from a pg_dump file."""
+    statement: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        lines = iter(f)
+        for line in lines:
+            stripped = line.rstrip("\n")
+            if match := COPY_START.match(stripped):
+                data = []
+                for row in lines:
+                    if row.rstrip("\n") == "\\.":
+                        break
+                    data.append(row)
+                columns = [c.strip() for c in match.group(2).split(",")]
+                yield "copy", (match.group(1), columns, "".join(data))
+                continue
+            if not statement and (not stripped or stripped.startswith("--")):
+                continue
+            statement.append(line)
+            if stripped.endswith(";"):
+                yield "sql", "".join(statement)
+                statement = []
+
+
+def load_backup_rows(path: str = BENCHMARK_BACKUP, table: str = "public.langchain_pg_embedding") -> List[Dict]:
+    rows = []
+    for kind, payload in iter_backup(path):
+        if kind != "copy" or payload[0] != table:
+            continue
+        _, columns, data = payload
+        for line in data.splitlines():
+            rows.append(dict(zip(columns, (_unescape(v) for v in line.split("\t")))))
+    return rows
+
+
+def _dsn_target(dsn: str) -> Tuple[str, str, str]:
+    params = parse_dsn(dsn)
+    return params.get("host", ""), params.get("port", "5432"), params.get("dbname", params.get("user", ""))
+
+
+def check_benchmark_dsn(dsn: str) -> str:
+    """Refuse to write benchmark data anywhere but an explicit, non-app database."""
+    if not dsn:
+        raise ValueError("No benchmark database given; set BENCHMARK_DSN or pass --dsn")
+    if PG_DSN and _dsn_target(dsn) == _dsn_target(PG_DSN):
+        raise ValueError("The benchmark DSN points at the app database (DB_DSN); refusing to "
+                         "drop or write its tables")
+    return dsn
+
+
+def seed_postgres(dsn: str = BENCHMARK_DSN, path: str = BENCHMARK_BACKUP) -> int:
+    """Replace the LangChain tables in `dsn` with the contents of the dump."""
+    conn = psycopg2.connect(check_benchmark_dsn(dsn))
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    cur.execute("DROP TABLE IF EXISTS langchain_pg_embedding, langchain_pg_collection CASCADE")
+    for kind, payload in iter_backup(path):
+        if kind == "sql":
+            # the dump's owner role may not exist locally
+            if " OWNER TO " in payload or payload.startswith("COMMENT ON EXTENSION"):
+                continue
+            cur.execute(payload)
+        else:
+            table, columns, data = payload
+            cur.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN", io.StringIO(data))
+
+    # pg_dump clears search_path for the session only
+    cur.execute("SELECT count(*) FROM public.langchain_pg_embedding")
+    n_rows = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+
+    print(f"Seeded {n_rows} chunks from {path}")
+    return n_rows
+
+
+class InProcessVectorStore:
+    """The dumped chunks and their stored embeddings, searched with numpy.
+
+    Stands in for pgvector when no database is available; vectors are the
+    ones in the dump, so results match an exact (non-ANN) pgvector search.
+    """
+
+    def __init__(self, path: str = BENCHMARK_BACKUP):
+        rows = load_backup_rows(path)
+        self.documents = [
+            Document(id=r["id"], page_content=r["document"] or "",
+                     metadata=json.loads(r["cmetadata"] or "{}"))
+            for r in rows
+        ]
+        vectors = np.array([json.loads(r["embedding"]) for r in rows], dtype=np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.games = np.array([d.metadata.get("document_name") for d in self.documents])
+
+    def search(self, query_vector: List[float], k: int, game_name: Optional[str] = None) -> List[Document]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = self.vectors @ (query / np.linalg.norm(query))
+        if game_name is not None and (self.games == game_name).any():
+            scores = np.where(self.games == game_name, scores, -np.inf)
+        top = np.argsort(-scores)[:k]
+        return [self.documents[i] for i in top if np.isfinite(scores[i])]
+
+
+class InProcessRetriever(BaseRetriever):
+    store: InProcessVectorStore
+    embeddings: Embeddings
+    k: int = 5
+    game_name: Optional[str] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.store.search(self.embeddings.embed_query(query), self.k, self.game_name)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector = await self.embeddings.aembed_query(query)
+        return self.store.search(vector, self.k, self.game_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a local pgvector database from backup.sql")
+    parser.add_argument("--dsn", default=BENCHMARK_DSN)
+    parser.add_argument("--backup", default=BENCHMARK_BACKUP)
+    args = parser.parse_args()
+
+    seed_postgres(args.dsn, args.backup)
@@ -1,13 +1,23 @@
 from ragas.metrics import context_precision, context_recall
 from ragas import evaluate
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 from datasets import Dataset
 import os
-from boardgame_agents.evaluation.generate_eval_data import generate_testset
-from boardgame_agents.rag.rag_helpers import get_reranked_retriever
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+from langchain_core.runnables import Runnable
+from src.boardgame_agents.evaluation.generate_eval_data import (
+    EVAL_CACHE_DIR,
+    corpus_fingerprint,
+    generate_testset,
+    load_chunks_from_pg,
+)
+from src.boardgame_agents.rag.rag_helpers import RETRIEVAL_MODE, get_reranked_retriever
+from src.boardgame_agents.rag.model_registry import CROSS_ENCODER_MODEL, INFERENCE_BACKEND, get_embeddings
+from src.boardgame_agents.rag.hybrid_retrieval import HYBRID_CANDIDATES, RRF_K
 from langchain_openai import ChatOpenAI
-from ragas.testset import Testset  # just for type hint / clarity
 import sys
 import mlflow
 
@@ -17,6 +27,8 @@ sys.path.append("C:/Github/ai_agent_board_game_rules")
 EMBED_MODEL = os.getenv(
     "EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
 )
+EVAL_BATCH_SIZE = int(os.getenv("EVAL_BATCH_SIZE", "32"))
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
 
 
 PG_DSN = os.getenv("DB_DSN")
@@ -31,41 +43,129 @@ def generate_llm(temperature=0):
     )
 
 
-def build_eval_dataset_from_testset(testset: "Testset"):
-
-    retriever = get_reranked_retriever()
+class RetrievalCache:
+    """Reranked contexts per question, one JSON file per retriever config.
+
+    Everything up to the rerank is keyed; `final_k` is not, since the full
+    reranked list of `initial_k` contexts is stored and sliced on read.
+    """
+
+    def __init__(self, config: Dict, cache_dir: str = EVAL_CACHE_DIR):
+        key = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+        self.path = Path(cache_dir) / "retrieval" / f"{key[:16]}.json"
+        self.results: Dict[str, List[str]] = {}
+        if self.path.exists():
+            self.results = json.loads(self.path.read_text())["results"]
+        self.config = config
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"config": self.config, "results": self.results}))
+        os.replace(tmp, self.path)
+
+
+def retrieve_contexts(
+    questions: List[str],
+    initial_k: int = 5,
+    embed_model: str = EMBED_MODEL,
+    cross_encoder_model: str = CROSS_ENCODER_MODEL,
+    corpus: str = "",
+    batch_size: int = EVAL_BATCH_SIZE,
+    concurrency: int = EVAL_CONCURRENCY,
+    retriever: Optional[Runnable] = None,
+    backend: str = "pgvector",
+) -> Dict[str, List[str]]:
+    """Reranked contexts for every question, retrieving only the uncached ones.
+
+    `retriever` overrides the PGVector one and must return all `initial_k`
+    reranked docs; `backend` names it in the cache key.
+    """
+    config = {
+        "corpus": corpus,
+        "backend": backend,
+        "mode": RETRIEVAL_MODE,
+        "initial_k": initial_k,
+        "embed_model": embed_model,
+        "cross_encoder_model": cross_encoder_model,
+        # onnx/openvino exports score slightly differently from torch
+        "inference_backend": INFERENCE_BACKEND,
+    }
+    if RETRIEVAL_MODE == "hybrid":
+        config.update({"hybrid_candidates": HYBRID_CANDIDATES, "rrf_k": RRF_K})
+    cache = RetrievalCache(config)
+    todo = [q for q in dict.fromkeys(questions) if q not in cache.results]
+    print(f"{len(questions) - len(todo)} questions cached, {len(todo)} to retrieve")
+
+    if todo:
+        # keep every candidate; callers slice to their final_k
+        retriever = retriever or get_reranked_retriever(
+            initial_k=initial_k,
+            final_k=initial_k,
+            embed_model=embed_model,
+            cross_encoder_model=cross_encoder_model,
+        )
+        for i in range(0, len(todo), batch_size):
+            batch = todo[i: i + batch_size]
+            # concurrent invokes share the reranker's micro-batches
+            results = retriever.batch(batch, config={"max_concurrency": concurrency})
+            for question, docs in zip(batch, results):
+                cache.results[question] = [d.page_content for d in docs]
+            cache.save()
+
+    return {q: cache.results[q] for q in questions}
+
+
+def build_eval_dataset_from_testset(
+    testset: List[Dict],
+    initial_k: int = 5,
+    final_k: int = 2,
+    embed_model: str = EMBED_MODEL,
+    cross_encoder_model: str = CROSS_ENCODER_MODEL,
+    corpus: str = "",
+    contexts: Optional[Dict[str, List[str]]] = None,
+):
+    if contexts is None:
+        contexts = retrieve_contexts(
+            [row["user_input"] for row in testset],
+            initial_k=initial_k,
+            embed_model=embed_model,
+            cross_encoder_model=cross_encoder_model,
+            corpus=corpus,
+        )
 
     rows = []
     for row in testset:
         question = row["user_input"]
-        ref_answer = row["reference"]  # ground-truth answer
-
-        # Run your real retriever (with reranker)
-        docs = retriever.invoke(question)
-        retrieved_contexts = [d.page_content for d in docs]
-
         rows.append(
             {
                 "user_input": question,
-                "retrieved_contexts": retrieved_contexts,
-                "reference": ref_answer,
+                "retrieved_contexts": contexts[question][:final_k],
+                "reference": row["reference"],  # ground-truth answer
             }
         )
 
     return Dataset.from_list(rows)
 
 
-def evaluate_rag(outpath):
-    eval_ds = build_eval_dataset_from_testset(generate_testset())
-
+def score_dataset(eval_ds):
     results = evaluate(
         eval_ds,
         metrics=[context_precision, context_recall],
         llm=generate_llm(),
-        embeddings=HuggingFaceEmbeddings(model_name=EMBED_MODEL),
+        embeddings=get_embeddings(EMBED_MODEL),
     )
+    return results.to_pandas()
+
+
+def evaluate_rag(outpath=None, initial_k: int = 5, final_k: int = 2):
+    # chunks are loaded once; their hash keys both the testset and retrieval caches
+    chunks = load_chunks_from_pg(collection_name="chunks")
+    corpus = corpus_fingerprint(chunks)
+    eval_ds = build_eval_dataset_from_testset(
+        generate_testset(chunks), initial_k=initial_k, final_k=final_k, corpus=corpus)
 
-    df = results.to_pandas()
+    df = score_dataset(eval_ds)
     mean_precision = df["context_precision"].mean()
     mean_recall = df["context_recall"].mean()
 
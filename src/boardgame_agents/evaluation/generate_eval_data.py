@@ -1,11 +1,12 @@
 import os
-from typing import List
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
 
-import psycopg2
 import psycopg2.extras
 
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_openai import ChatOpenAI
 
 from ragas.testset import TestsetGenerator
@@ -15,10 +16,14 @@ from ragas.testset.transforms.splitters import HeadlineSplitter
 
 from ragas.llms import llm_factory
 
+from src.boardgame_agents.rag.model_registry import get_embeddings
+from src.boardgame_agents.rag.db_utils import iter_rows
+
 
-PG_DSN = os.getenv("DB_DSN")
 EMBED_MODEL = os.getenv(
     "EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EVAL_CACHE_DIR = os.getenv("EVAL_CACHE_DIR", ".eval_cache")
+TESTSET_SIZE = int(os.getenv("TESTSET_SIZE", "20"))
 
 
 def generate_llm(temperature: float = 0.0):
@@ -31,10 +36,8 @@ def generate_llm(temperature: float = 0.0):
 
 
 def load_chunks_from_pg(collection_name: str = "chunks"):
-    conn = psycopg2.connect(PG_DSN)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    cur.execute(
+    # rows arrive in PG_FETCH_SIZE batches instead of one fetchall()
+    rows = iter_rows(
         """
         SELECT e.document, e.cmetadata
         FROM langchain_pg_embedding e
@@ -42,12 +45,9 @@ def load_chunks_from_pg(collection_name: str = "chunks"):
         WHERE c.name = %s
         """,
         (collection_name,),
+        cursor_factory=psycopg2.extras.RealDictCursor,
     )
 
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
     docs: List[Document] = []
     for row in rows:
         page_content = row["document"]
@@ -57,30 +57,61 @@ def load_chunks_from_pg(collection_name: str = "chunks"):
     return docs
 
 
+def corpus_fingerprint(chunks: List[Document]) -> str:
+    """Order-independent hash of the chunk texts and metadata."""
+    digests = sorted(
+        hashlib.sha256(
+            (c.page_content + json.dumps(c.metadata, sort_keys=True)).encode("utf-8")
+        ).hexdigest()
+        for c in chunks
+    )
+    return hashlib.sha256("".join(digests).encode("utf-8")).hexdigest()
+
+
 def build_ragas_generator():
     llm_wrapper = LangchainLLMWrapper(generate_llm())
     # llm_wrapper = llm_factory(model=os.getenv(
     #    "LLM_MODEL"), client=generate_llm())
     emb_wrapper = LangchainEmbeddingsWrapper(
-        HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+        get_embeddings(EMBED_MODEL)
     )
     return TestsetGenerator(llm=llm_wrapper, embedding_model=emb_wrapper)
 
 
-def generate_testset():
-    chunks = load_chunks_from_pg(collection_name="chunks")
-    print(f"Loaded {len(chunks)} chunks from PGVector")
+def generate_testset(
+    chunks: Optional[List[Document]] = None,
+    testset_size: int = TESTSET_SIZE,
+    cache_dir: str = EVAL_CACHE_DIR,
+    refresh: bool = False,
+) -> List[Dict]:
+    """Synthetic (user_input, reference) rows, reused while the corpus is unchanged."""
+    if chunks is None:
+        chunks = load_chunks_from_pg(collection_name="chunks")
+        print(f"Loaded {len(chunks)} chunks from PGVector")
+
+    path = Path(cache_dir) / "testsets" / \
+        f"{corpus_fingerprint(chunks)[:16]}_{testset_size}.jsonl"
+    if path.exists() and not refresh:
+        print(f"Reusing testset {path}")
+        return [json.loads(line) for line in path.read_text().splitlines()]
 
     generator = build_ragas_generator()
     transforms = [HeadlineSplitter()]  # keep only what you want
 
     testset = generator.generate_with_langchain_docs(
         documents=chunks,
-        testset_size=20,
+        testset_size=testset_size,
         transforms=transforms,
         #   raise_exceptions=False,
     )
-    return testset.to_dataset()
+    rows = [
+        {"user_input": r["user_input"], "reference": r["reference"]}
+        for r in testset.to_pandas().to_dict("records")
+    ]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(json.dumps(r) for r in rows))
+    return rows
 
 
 if __name__ == "__main__":
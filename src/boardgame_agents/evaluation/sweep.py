@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import mlflow
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from src.boardgame_agents.evaluation.evaluate_rag import (
+    EMBED_MODEL,
+    build_eval_dataset_from_testset,
+    retrieve_contexts,
+    score_dataset,
+)
+from src.boardgame_agents.evaluation.generate_eval_data import (
+    EVAL_CACHE_DIR,
+    corpus_fingerprint,
+    generate_testset,
+    load_chunks_from_pg,
+)
+from src.boardgame_agents.rag.model_registry import CROSS_ENCODER_MODEL, get_embeddings
+from src.boardgame_agents.rag.rag_helpers import Reranker, get_reranked_retriever
+
+
+# questions timed per configuration, uncached and one at a time
+SWEEP_LATENCY_SAMPLE = int(os.getenv("SWEEP_LATENCY_SAMPLE", "20"))
+
+# the model the stored "chunks" collection was embedded with
+COLLECTION_EMBED_MODEL = EMBED_MODEL
+
+CONFIG_KEYS = ("embed_model", "cross_encoder_model", "initial_k", "final_k", "backend")
+
+
+def _csv(cast):
+    return lambda s: [cast(x.strip()) for x in s.split(",") if x.strip()]
+
+
+def build_retriever(
+    chunks: List[Document],
+    initial_k: int,
+    embed_model: str,
+    cross_encoder_model: str,
+    stores: Dict[str, InMemoryVectorStore],
+) -> Tuple[Reranker, str]:
+    """Reranker returning all `initial_k` candidates, and its backend name.
+
+    PGVector only holds vectors from the collection's model; other embedding
+    models search the same chunks re-embedded into an in-memory store.
+    """
+    if embed_model == COLLECTION_EMBED_MODEL:
+        retriever = get_reranked_retriever(
+            initial_k=initial_k,
+            final_k=initial_k,
+            embed_model=embed_model,
+            cross_encoder_model=cross_encoder_model,
+        )
+        return retriever, "pgvector"
+
+    if embed_model not in stores:
+        print(f"Embedding {len(chunks)} chunks with {embed_model}")
+        stores[embed_model] = InMemoryVectorStore.from_documents(
+            chunks, get_embeddings(embed_model))
+    base = stores[embed_model].as_retriever(search_kwargs={"k": initial_k})
+    return Reranker(base, model_name=cross_encoder_model, top_k=initial_k), "memory"
+
+
+def measure_latency(retriever: Reranker, questions: List[str], sample: int = SWEEP_LATENCY_SAMPLE) -> Dict[str, float]:
+    """Retrieval and cross-encoder seconds per question, bypassing every cache."""
+    questions = questions[:sample]
+    retriever.invoke(questions[0])  # connections, model weights
+
+    retrieval, rerank = [], []
+    for question in questions:
+        start = time.perf_counter()
+        docs = retriever.retriever.invoke(question)
+        retrieval.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        retriever.model.predict([(question, d.page_content) for d in docs])
+        rerank.append(time.perf_counter() - start)
+
+    total = np.add(retrieval, rerank)
+    return {
+        "retrieval_seconds_mean": float(np.mean(retrieval)),
+        "retrieval_seconds_p95": float(np.percentile(retrieval, 95)),
+        "rerank_seconds_mean": float(np.mean(rerank)),
+        "rerank_seconds_p95": float(np.percentile(rerank, 95)),
+        "latency_seconds_mean": float(np.mean(total)),
+        "latency_seconds_p95": float(np.percentile(total, 95)),
+    }
+
+
+def cached_scores(config: Dict, compute, cache_dir: str = EVAL_CACHE_DIR) -> Dict[str, float]:
+    """Ragas means per config, so re-running a sweep skips the judge LLM."""
+    # a different judge gives different scores for the same contexts
+    config = {**config, "judge_model": os.getenv("LLM_MODEL")}
+    key = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+    path = Path(cache_dir) / "scores" / f"{key[:16]}.json"
+    if path.exists():
+        return json.loads(path.read_text())
+
+    scores = compute()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(scores))
+    return scores
+
+
+def pareto_frontier(results: List[Dict]) -> List[Dict]:
+    """Configs no other config beats on precision, recall and mean latency at once."""
+    def dominates(a, b):
+        no_worse = (
+            a["context_precision"] >= b["context_precision"]
+            and a["context_recall"] >= b["context_recall"]
+            and a["latency_seconds_mean"] <= b["latency_seconds_mean"]
+        )
+        better = (
+            a["context_precision"] > b["context_precision"]
+            or a["context_recall"] > b["context_recall"]
+            or a["latency_seconds_mean"] < b["latency_seconds_mean"]
+        )
+        return no_worse and better
+
+    frontier = [r for r in results if not any(dominates(o, r) for o in results)]
+    return sorted(frontier, key=lambda r: r["latency_seconds_mean"])
+
+
+def fastest_meeting(results: List[Dict], min_precision: float, min_recall: float) -> Optional[Dict]:
+    eligible = [
+        r for r in results
+        if r["context_precision"] >= min_precision and r["context_recall"] >= min_recall
+    ]
+    return min(eligible, key=lambda r: r["latency_seconds_mean"]) if eligible else None
+
+
+def sweep(
+    initial_ks: List[int],
+    final_ks: List[int],
+    embed_models: List[str],
+    cross_encoder_models: List[str],
+    min_precision: float = 0.0,
+    min_recall: float = 0.0,
+    outpath: Optional[str] = None,
+) -> List[Dict]:
+    chunks = load_chunks_from_pg(collection_name="chunks")
+    corpus = corpus_fingerprint(chunks)
+    testset = generate_testset(chunks)
+    questions = [row["user_input"] for row in testset]
+
+    stores: Dict[str, InMemoryVectorStore] = {}
+    results: List[Dict] = []
+
+    with mlflow.start_run(run_name="retrieval_sweep"):
+        mlflow.log_params({
+            "initial_ks": initial_ks,
+            "final_ks": final_ks,
+            "embed_models": embed_models,
+            "cross_encoder_models": cross_encoder_models,
+            "corpus": corpus[:16],
+            "questions": len(questions),
+        })
+
+        for embed_model, cross_encoder_model, initial_k in itertools.product(
+            embed_models, cross_encoder_models, initial_ks
+        ):
+            retriever, backend = build_retriever(
+                chunks, initial_k, embed_model, cross_encoder_model, stores)
+            latency = measure_latency(retriever, questions)
+            # one reranked list per initial_k, shared by every final_k below
+            contexts = retrieve_contexts(
+                questions,
+                initial_k=initial_k,
+                embed_model=embed_model,
+                cross_encoder_model=cross_encoder_model,
+                corpus=corpus,
+                retriever=retriever,
+                backend=backend,
+            )
+
+            for final_k in (k for k in final_ks if k <= initial_k):
+                config = dict(zip(CONFIG_KEYS, (
+                    embed_model, cross_encoder_model, initial_k, final_k, backend)))
+
+                def compute():
+                    df = score_dataset(build_eval_dataset_from_testset(
+                        testset, final_k=final_k, contexts=contexts))
+                    return {
+                        "context_precision": float(df["context_precision"].mean()),
+                        "context_recall": float(df["context_recall"].mean()),
+                    }
+
+                scores = cached_scores({**config, "corpus": corpus}, compute)
+                result = {**config, **scores, **latency}
+                results.append(result)
+                print(json.dumps(result))
+
+                run_name = f"{Path(embed_model).name}|{Path(cross_encoder_model).name}|k{initial_k}->{final_k}"
+                with mlflow.start_run(run_name=run_name, nested=True):
+                    mlflow.log_params(config)
+                    mlflow.log_metrics({**scores, **latency})
+
+        frontier = pareto_frontier(results)
+        best = fastest_meeting(results, min_precision, min_recall)
+        mlflow.log_dict(results, "sweep_results.json")
+        mlflow.log_dict(frontier, "pareto_frontier.json")
+        if best:
+            mlflow.log_params({f"best_{k}": best[k] for k in CONFIG_KEYS})
+
+    print("\nPareto frontier (fastest first):")
+    for r in frontier:
+        print(f"  {r['embed_model']} + {r['cross_encoder_model']} "
+              f"k={r['initial_k']}->{r['final_k']}: "
+              f"precision={r['context_precision']:.3f} recall={r['context_recall']:.3f} "
+              f"latency={r['latency_seconds_mean'] * 1000:.1f}ms")
+    if best:
+        print(f"Fastest meeting precision>={min_precision} recall>={min_recall}: {best}")
+    else:
+        print(f"No configuration meets precision>={min_precision} recall>={min_recall}")
+
+    if outpath:
+        Path(outpath).write_text(json.dumps({"results": results, "frontier": frontier}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep retrieval settings and report the Pareto frontier")
+    parser.add_argument("--initial-k", type=_csv(int), default=[5, 10, 20])
+    parser.add_argument("--final-k", type=_csv(int), default=[2, 3, 5])
+    parser.add_argument("--embed-models", type=_csv(str), default=[EMBED_MODEL])
+    parser.add_argument("--cross-encoders", type=_csv(str), default=[CROSS_ENCODER_MODEL])
+    parser.add_argument("--min-precision", type=float, default=0.0)
+    parser.add_argument("--min-recall", type=float, default=0.0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    sweep(
+        args.initial_k,
+        args.final_k,
+        args.embed_models,
+        args.cross_encoders,
+        min_precision=args.min_precision,
+        min_recall=args.min_recall,
+        outpath=args.output,
+    )
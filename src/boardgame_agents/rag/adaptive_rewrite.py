@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+
+from src.boardgame_agents.rag.instrumentation import StageTimings, pipeline_timings
+from src.boardgame_agents.rag.rerank_service import normalize_query
+
+
+REWRITE_CACHE_SIZE = int(os.getenv("REWRITE_CACHE_SIZE", "10000"))
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "0") == "1"
+# questions this short ("and in 2 player?") lean on the previous turn
+SHORT_QUESTION_WORDS = int(os.getenv("SHORT_QUESTION_WORDS", "4"))
+
+ANAPHORA = re.compile(
+    r"\b(it|its|it's|that|this|these|those|they|them|their|theirs|there|"
+    r"he|she|him|her|one|ones|same|such|former|latter|above|previous|"
+    r"again|also|instead|else|other|another)\b",
+    re.IGNORECASE,
+)
+
+
+def needs_rewrite(question: str, chat_history: List[BaseMessage]) -> bool:
+    if not chat_history:
+        return False
+    return bool(ANAPHORA.search(question)) or len(question.split()) <= SHORT_QUESTION_WORDS
+
+
+def history_digest(chat_history: List[BaseMessage]) -> str:
+    payload = json.dumps([(m.type, m.content) for m in chat_history])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _discard(task: "asyncio.Task") -> None:
+    """Cancel a speculative search, releasing its DB connection.
+
+    A task that already failed is cancelled too late, so its exception is
+    consumed here to avoid "Task exception was never retrieved".
+    """
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+class RewriteCache:
+    """LRU of rewritten queries keyed by (history digest, normalized input)."""
+
+    def __init__(self, max_size: int = REWRITE_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Tuple[str, str], rewritten: str) -> None:
+        with self._lock:
+            self._data[key] = rewritten
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class AdaptiveRewriteRetriever(Runnable):
+    """Drop-in for `create_history_aware_retriever` that only calls the LLM when needed.
+
+    The rewrite is skipped when there is no history or the question is
+    self-contained, and earlier rewrites are reused from `cache`. With
+    `speculative=True` retrieval on the raw question runs while the LLM
+    rewrites, and is used if the rewrite comes back unchanged.
+    """
+
+    def __init__(
+        self,
+        llm,
+        retriever: Runnable,
+        prompt,
+        cache: Optional[RewriteCache] = None,
+        timings: Optional[StageTimings] = None,
+        speculative: bool = SPECULATIVE_RETRIEVAL,
+    ):
+        self.retriever = retriever
+        self.rewrite_chain = prompt | llm | StrOutputParser()
+        self.cache = cache or RewriteCache()
+        self.timings = timings or pipeline_timings
+        self.speculative = speculative
+
+    def _plan(self, inputs: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[Tuple[str, str]]]:
+        """Return (question, query if already known, cache key)."""
+        question = inputs["input"]
+        chat_history = inputs.get("chat_history") or []
+
+        if not needs_rewrite(question, chat_history):
+            self.timings.record("rewrite_skipped", 0.0)
+            return question, question, None
+
+        key = (history_digest(chat_history), normalize_query(question))
+        if (cached := self.cache.get(key)) is not None:
+            self.timings.record("rewrite_cache_hit", 0.0)
+            return question, cached, key
+        return question, None, key
+
+    def invoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> List[Document]:
+        question, query, key = self._plan(inputs)
+
+        if query is None:
+            with self.timings.time("rewrite"):
+                query = self.rewrite_chain.invoke(inputs, config=config)
+            self.cache.put(key, query)
+
+        with self.timings.time("retrieve"):
+            return self.retriever.invoke(query, config=config)
+
+    async def ainvoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> List[Document]:
+        question, query, key = self._plan(inputs)
+
+        if query is not None:
+            with self.timings.time("retrieve"):
+                return await self.retriever.ainvoke(query, config=config)
+
+        speculative = None
+        if self.speculative:
+            speculative = asyncio.create_task(
+                self.retriever.ainvoke(question, config=config))
+
+        try:
+            with self.timings.time("rewrite"):
+                query = await self.rewrite_chain.ainvoke(inputs, config=config)
+        except BaseException:
+            if speculative is not None:
+                _discard(speculative)
+            raise
+        self.cache.put(key, query)
+
+        if speculative is not None:
+            if normalize_query(query) == normalize_query(question):
+                self.timings.record("speculative_hit", 0.0)
+                with self.timings.time("retrieve"):
+                    return await speculative
+            _discard(speculative)
+
+        with self.timings.time("retrieve"):
+            return await self.retriever.ainvoke(query, config=config)
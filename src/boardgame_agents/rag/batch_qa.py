@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import functools
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from langchain_classic.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+
+from src.boardgame_agents.rag.prompt_templates_rag import get_qa_message
+from src.boardgame_agents.rag.rag_helpers import (
+    EMBED_MODEL,
+    get_embeddings,
+    get_llm_model,
+    get_retriever,
+    pack_documents,
+)
+from src.boardgame_agents.rag.model_registry import CROSS_ENCODER_MODEL
+from src.boardgame_agents.rag.rerank_service import get_rerank_engine
+from src.boardgame_agents.rag.instrumentation import pipeline_timings
+
+
+# questions embedded, searched and reranked together before their LLM calls start
+BATCH_QA_WAVE_SIZE = int(os.getenv("BATCH_QA_WAVE_SIZE", "256"))
+BATCH_QA_SEARCH_CONCURRENCY = int(os.getenv("BATCH_QA_SEARCH_CONCURRENCY", "16"))
+BATCH_QA_LLM_CONCURRENCY = int(os.getenv("BATCH_QA_LLM_CONCURRENCY", "8"))
+# games whose retriever and QA chain stay built, least recently used evicted first
+BATCH_QA_CACHE_SIZE = int(os.getenv("BATCH_QA_CACHE_SIZE", "32"))
+
+
+@dataclass
+class BatchItem:
+    index: int
+    game_name: str
+    question: str
+    docs: List[Document] = field(default_factory=list)
+
+
+def parse_jsonl(lines: Iterable[str]) -> List[BatchItem]:
+    """Read {"game": ..., "question": ...} lines ("game_name" / "input" also accepted)."""
+    items = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            game_name = row.get("game") or row["game_name"]
+            question = row.get("question") or row["input"]
+        except (json.JSONDecodeError, KeyError, AttributeError) as e:
+            raise ValueError(f"line {line_no}: expected a game and a question ({e})") from e
+        # a null or blank game would fall back to an unscoped search
+        for name, value in (("game", game_name), ("question", question)):
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"line {line_no}: expected a non-empty {name}, got {value!r}")
+        items.append(BatchItem(len(items), game_name, question))
+    return items
+
+
+class BatchQA:
+    """Answers many independent (game, question) pairs without chat history.
+
+    Each wave of questions is embedded in one forward pass, searched
+    concurrently and reranked as a single request to the shared rerank
+    engine; LLM calls then run under a semaphore and results are yielded in
+    completion order, while the next wave is already being retrieved.
+    """
+
+    def __init__(
+        self,
+        llm=None,
+        initial_k: int = 5,
+        final_k: int = 2,
+        wave_size: int = BATCH_QA_WAVE_SIZE,
+        search_concurrency: int = BATCH_QA_SEARCH_CONCURRENCY,
+        llm_concurrency: int = BATCH_QA_LLM_CONCURRENCY,
+        cache_size: int = BATCH_QA_CACHE_SIZE,
+    ):
+        self.llm = llm or get_llm_model()
+        self.initial_k = initial_k
+        self.final_k = final_k
+        self.wave_size = wave_size
+        self.search_concurrency = search_concurrency
+        self.llm_concurrency = llm_concurrency
+
+        self.embeddings = get_embeddings(EMBED_MODEL)
+        self.engine = get_rerank_engine(CROSS_ENCODER_MODEL)
+        self.document_prompt = PromptTemplate.from_template(
+            "From {source} (page {page}):\n{page_content}"
+        )
+        # game names come from request bodies, so the caches are bounded
+        self.cache_size = cache_size
+        self._retrievers: "OrderedDict[str, Any]" = OrderedDict()
+        self._qa_chains: "OrderedDict[str, Any]" = OrderedDict()
+
+    def _cached(self, cache: "OrderedDict[str, Any]", game_name: str, build) -> Any:
+        if game_name in cache:
+            cache.move_to_end(game_name)
+            return cache[game_name]
+
+        value = cache[game_name] = build()
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def _retriever(self, game_name: str):
+        return self._cached(self._retrievers, game_name, lambda: get_retriever(
+            k=self.initial_k, async_mode=True, game_name=game_name))
+
+    def _qa_chain(self, game_name: str):
+        return self._cached(self._qa_chains, game_name, lambda: create_stuff_documents_chain(
+            self.llm.with_config(tags=["generate"]),
+            get_qa_message(game_name, add_context=True),
+            document_prompt=self.document_prompt,
+            document_separator="\n\n---\n\n",
+        ))
+
+    async def _retrieve_wave(self, items: List[BatchItem]) -> None:
+        loop = asyncio.get_running_loop()
+
+        with pipeline_timings.time("batch_embed"):
+            vectors = await loop.run_in_executor(
+                None, self.embeddings.embed_documents, [i.question for i in items])
+
+        semaphore = asyncio.Semaphore(self.search_concurrency)
+
+        async def search(item: BatchItem, vector: List[float]) -> None:
+            async with semaphore:
+                item.docs = await self._retriever(item.game_name).asearch(item.question, vector)
+
+        with pipeline_timings.time("batch_search"):
+            await asyncio.gather(*(search(i, v) for i, v in zip(items, vectors)))
+
+        with pipeline_timings.time("batch_rerank"):
+            scores = await loop.run_in_executor(
+                None, self.engine.score_many, [(i.question, i.docs) for i in items])
+
+        for item, item_scores in zip(items, scores):
+            ranked = sorted(zip(item.docs, item_scores), key=lambda x: x[1], reverse=True)
+            item.docs = pack_documents([d for d, _ in ranked[: self.final_k]])
+
+    async def _answer(self, item: BatchItem, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            answer = await self._qa_chain(item.game_name).ainvoke(
+                {"input": item.question, "context": item.docs, "chat_history": []})
+        return {
+            "index": item.index,
+            "game": item.game_name,
+            "question": item.question,
+            "answer": answer,
+            "sources": [
+                {"source": d.metadata.get("source"), "page": d.metadata.get("page")}
+                for d in item.docs
+            ],
+            "llm_seconds": round(time.perf_counter() - start, 3),
+        }
+
+    async def run(self, items: List[BatchItem]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one result dict per item as soon as its answer is ready.
+
+        Every item gets a future that is always settled, with an answer or an
+        error, even when its task is cancelled or the producer dies; closing
+        the generator cancels the work still outstanding.
+        """
+        loop = asyncio.get_running_loop()
+        llm_semaphore = asyncio.Semaphore(self.llm_concurrency)
+        pending = {item.index: loop.create_future() for item in items}
+        tasks: Dict[int, "asyncio.Task[None]"] = {}
+
+        def settle(item: BatchItem, result: Dict[str, Any]) -> None:
+            if not pending[item.index].done():
+                pending[item.index].set_result(result)
+
+        def error(item: BatchItem, e: BaseException) -> Dict[str, Any]:
+            return {"index": item.index, "game": item.game_name,
+                    "question": item.question, "error": repr(e)}
+
+        def failure(task: asyncio.Task) -> Optional[BaseException]:
+            return asyncio.CancelledError() if task.cancelled() else task.exception()
+
+        def answered(item: BatchItem, task: asyncio.Task) -> None:
+            if (e := failure(task)) is not None:
+                settle(item, error(item, e))
+
+        def produced(task: asyncio.Task) -> None:
+            # items the producer never reached would otherwise wait forever
+            if (e := failure(task)) is not None:
+                for item in items:
+                    if item.index not in tasks:
+                        settle(item, error(item, e))
+
+        async def answer(item: BatchItem) -> None:
+            settle(item, await self._answer(item, llm_semaphore))
+
+        async def produce() -> None:
+            for i in range(0, len(items), self.wave_size):
+                wave = items[i: i + self.wave_size]
+                try:
+                    await self._retrieve_wave(wave)
+                except Exception as e:
+                    for item in wave:
+                        settle(item, error(item, e))
+                    continue
+                for item in wave:
+                    task = tasks[item.index] = asyncio.create_task(answer(item))
+                    task.add_done_callback(functools.partial(answered, item))
+
+        producer = asyncio.create_task(produce())
+        producer.add_done_callback(produced)
+        try:
+            for future in asyncio.as_completed(list(pending.values())):
+                yield await future
+        finally:
+            producer.cancel()
+            for task in tasks.values():
+                task.cancel()
+
+
+async def _run_cli(args) -> None:
+    with open(args.input) as f:
+        items = parse_jsonl(f)
+
+    batch = BatchQA(
+        initial_k=args.initial_k,
+        final_k=args.final_k,
+        search_concurrency=args.search_concurrency,
+        llm_concurrency=args.llm_concurrency,
+    )
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    n_errors = 0
+    try:
+        async for result in batch.run(items):
+            n_errors += "error" in result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Answered {len(items) - n_errors}/{len(items)} questions "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of (game, question) pairs")
+    parser.add_argument("input")
+    parser.add_argument("--output", default=None, help="NDJSON results (default stdout)")
+    parser.add_argument("--initial-k", type=int, default=5)
+    parser.add_argument("--final-k", type=int, default=2)
+    parser.add_argument("--search-concurrency", type=int, default=BATCH_QA_SEARCH_CONCURRENCY)
+    parser.add_argument("--llm-concurrency", type=int, default=BATCH_QA_LLM_CONCURRENCY)
+    args = parser.parse_args()
+
+    asyncio.run(_run_cli(args))
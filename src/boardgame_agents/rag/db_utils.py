@@ -1,5 +1,144 @@
 import os
+import uuid
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional, Set, Tuple
+
 from dotenv import load_dotenv
+from psycopg2 import Error as PsycopgError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 load_dotenv()
 PG_DSN = os.getenv("DB_DSN", "")
+PG_POOL_SIZE = int(os.getenv("PG_POOL_SIZE", "10"))
+PG_MAX_OVERFLOW = int(os.getenv("PG_MAX_OVERFLOW", "10"))
+# rows per round trip when streaming through a server-side cursor
+PG_FETCH_SIZE = int(os.getenv("PG_FETCH_SIZE", "2000"))
+# how long get_connection waits for a free pooled connection
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+
+
+def sqlalchemy_url(dsn: str, async_mode: bool = False) -> str:
+    """Point a DSN at the psycopg 3 driver when an async engine is needed."""
+    if not async_mode:
+        return dsn
+    _, rest = dsn.split("://", 1)
+    return f"postgresql+psycopg://{rest}"
+
+
+@lru_cache(maxsize=None)
+def get_engine(options: str = "") -> Engine:
+    return create_engine(
+        sqlalchemy_url(PG_DSN),
+        pool_size=PG_POOL_SIZE,
+        max_overflow=PG_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        connect_args={"options": options} if options else {},
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_engine(options: str = "") -> AsyncEngine:
+    return create_async_engine(
+        sqlalchemy_url(PG_DSN, async_mode=True),
+        pool_size=PG_POOL_SIZE,
+        max_overflow=PG_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        connect_args={"options": options} if options else {},
+    )
+
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_slots: Optional[threading.BoundedSemaphore] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Tuple[ThreadedConnectionPool, threading.BoundedSemaphore]:
+    global _pool, _pool_slots, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # connections inherited from a parent must not be shared, drop them
+            max_conn = PG_POOL_SIZE + PG_MAX_OVERFLOW
+            _pool = ThreadedConnectionPool(1, max_conn, PG_DSN)
+            # ThreadedConnectionPool raises when exhausted; callers queue here instead
+            _pool_slots = threading.BoundedSemaphore(max_conn)
+            _pool_pid = os.getpid()
+        return _pool, _pool_slots
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Process-wide psycopg2 pool, recreated after a fork."""
+    return _get_pool()[0]
+
+
+def _release(pool: ThreadedConnectionPool, conn) -> None:
+    # runs for BaseExceptions too (KeyboardInterrupt, GeneratorExit), so an
+    # open transaction is rolled back before autocommit can be touched
+    broken = bool(conn.closed)
+    if not broken:
+        try:
+            if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.autocommit = False
+        except PsycopgError:
+            broken = True
+    pool.putconn(conn, close=broken)
+
+
+@contextmanager
+def get_connection(autocommit: bool = False, timeout: float = PG_POOL_TIMEOUT):
+    """Borrow a pooled connection; commits on success, rolls back otherwise.
+
+    Waits up to `timeout` seconds for a connection when all are in use.
+    """
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=timeout):
+        raise PoolError(f"No database connection free after {timeout}s")
+    try:
+        conn = pool.getconn()
+        try:
+            conn.autocommit = autocommit
+            yield conn
+            if not autocommit:
+                conn.commit()
+        finally:
+            _release(pool, conn)
+    finally:
+        slots.release()
+
+
+def iter_rows(query: str, params: Any = None, cursor_factory=None,
+              itersize: int = PG_FETCH_SIZE) -> Iterator[Any]:
+    """Stream a query's rows through a server-side (named) cursor."""
+    with get_connection() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=cursor_factory) as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            yield from cur
+
+
+def documents_exist(doc_names: Iterable[str]) -> Set[str]:
+    """The subset of `doc_names` with at least one stored chunk, in one query."""
+    names = list(dict.fromkeys(doc_names))
+    if not names:
+        return set()
+
+    with get_connection() as conn, conn.cursor() as cur:
+        # one `@>` probe per name, each served by ix_cmetadata_gin
+        cur.execute(
+            """
+            SELECT n.name
+            FROM unnest(%s::text[]) AS n(name)
+            WHERE EXISTS (
+                SELECT 1 FROM langchain_pg_embedding e
+                WHERE e.cmetadata @> jsonb_build_object('document_name', n.name)
+            )
+            """,
+            (names,),
+        )
+        return {row[0] for row in cur.fetchall()}
@@ -0,0 +1,139 @@
+import os
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import text
+from langchain_core.messages import (
+    BaseMessage,
+    messages_from_dict,
+    messages_to_dict,
+    trim_messages,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.boardgame_agents.rag.db_utils import get_async_engine
+
+
+CHAT_HISTORY_CACHE_SIZE = int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "1000"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "50"))
+CHAT_HISTORY_PERSIST = os.getenv("CHAT_HISTORY_PERSIST", "1") == "1"
+
+CREATE_TABLE_SQL = text(
+    """
+    CREATE TABLE IF NOT EXISTS rag_chat_history (
+        session_id character varying PRIMARY KEY,
+        messages jsonb NOT NULL,
+        updated_at timestamp with time zone NOT NULL DEFAULT now()
+    )
+    """
+)
+
+SELECT_SQL = text(
+    "SELECT messages FROM rag_chat_history WHERE session_id = :session_id"
+)
+
+UPSERT_SQL = text(
+    """
+    INSERT INTO rag_chat_history (session_id, messages, updated_at)
+    VALUES (:session_id, CAST(:messages AS jsonb), now())
+    ON CONFLICT (session_id)
+    DO UPDATE SET messages = EXCLUDED.messages, updated_at = now()
+    """
+)
+
+
+class ChatHistoryStore:
+    """Chat histories in an in-memory LRU tier backed by PostgreSQL.
+
+    Stored histories are capped at `max_messages`; `window` trims what is sent
+    to the LLM to `token_budget` so prompts stay bounded on long sessions.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = CHAT_HISTORY_CACHE_SIZE,
+        token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+        max_messages: int = CHAT_HISTORY_MAX_MESSAGES,
+        persist: bool = CHAT_HISTORY_PERSIST,
+    ):
+        self.cache_size = cache_size
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.persist = persist
+
+        self._cache: "OrderedDict[str, List[BaseMessage]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._table_lock = asyncio.Lock()
+
+    def _cache_get(self, session_id: str) -> Optional[List[BaseMessage]]:
+        with self._lock:
+            if session_id not in self._cache:
+                return None
+            self._cache.move_to_end(session_id)
+            return list(self._cache[session_id])
+
+    def _cache_put(self, session_id: str, messages: List[BaseMessage]) -> None:
+        with self._lock:
+            self._cache[session_id] = list(messages)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _ensure_table(self, conn) -> None:
+        if self._table_ready:
+            return
+        async with self._table_lock:
+            if not self._table_ready:
+                await conn.execute(CREATE_TABLE_SQL)
+                self._table_ready = True
+
+    def window(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        return trim_messages(
+            messages,
+            max_tokens=self.token_budget,
+            token_counter=count_tokens_approximately,
+            strategy="last",
+            start_on="human",
+        )
+
+    async def load(self, session_id: Optional[str]) -> List[BaseMessage]:
+        if not session_id:
+            return []
+
+        messages = self._cache_get(session_id)
+        if messages is not None:
+            return messages
+
+        messages = []
+        if self.persist:
+            async with get_async_engine().begin() as conn:
+                await self._ensure_table(conn)
+                row = (await conn.execute(SELECT_SQL, {"session_id": session_id})).first()
+            if row is not None:
+                messages = messages_from_dict(row.messages)
+
+        self._cache_put(session_id, messages)
+        return messages
+
+    async def save(self, session_id: Optional[str], messages: List[BaseMessage]) -> None:
+        if not session_id:
+            return
+
+        messages = messages[-self.max_messages:]
+        self._cache_put(session_id, messages)
+
+        if self.persist:
+            async with get_async_engine().begin() as conn:
+                await self._ensure_table(conn)
+                await conn.execute(
+                    UPSERT_SQL,
+                    {
+                        "session_id": session_id,
+                        "messages": json.dumps(messages_to_dict(messages)),
+                    },
+                )
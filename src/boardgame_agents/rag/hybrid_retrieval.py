@@ -0,0 +1,218 @@
+import os
+import json
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from src.boardgame_agents.rag.db_utils import get_async_engine, get_connection, get_engine
+from src.boardgame_agents.rag.scoped_retrieval import (
+    SCOPED_MIN_RESULTS,
+    _merge_results,
+    _to_documents,
+)
+
+
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+TS_CONFIG = os.getenv("TS_CONFIG", "english")
+
+
+def _hybrid_sql(scoped: bool):
+    scope = "AND e.cmetadata @> CAST(:scope AS jsonb)" if scoped else ""
+    # as in SCOPED_SEARCH_SQL, the game filter is materialized first so the
+    # HNSW index cannot rank all games and filter too few rows afterwards
+    game_rows = f"""
+        game_rows AS MATERIALIZED (
+            SELECT e.id, e.embedding
+            FROM langchain_pg_embedding e
+            WHERE e.collection_id = (SELECT uuid FROM collection) {scope}
+        ),""" if scoped else ""
+    vector_source = "game_rows e" if scoped else (
+        "langchain_pg_embedding e WHERE e.collection_id = (SELECT uuid FROM collection)")
+    # plainto_tsquery ANDs every term; OR them so partial matches still rank
+    return text(
+        f"""
+        WITH q AS (
+            SELECT to_tsquery(
+                '{TS_CONFIG}',
+                replace(plainto_tsquery('{TS_CONFIG}', :query)::text, '&', '|')
+            ) AS query
+        ),
+        collection AS (
+            SELECT uuid FROM langchain_pg_collection WHERE name = :collection
+        ),{game_rows}
+        vector_hits AS (
+            SELECT e.id,
+                   RANK() OVER (ORDER BY e.embedding <=> CAST(:embedding AS vector)) AS rank
+            FROM {vector_source}
+            ORDER BY e.embedding <=> CAST(:embedding AS vector)
+            LIMIT :candidates
+        ),
+        lexical_hits AS (
+            SELECT e.id,
+                   RANK() OVER (ORDER BY ts_rank_cd(e.document_tsv, q.query, 32) DESC) AS rank
+            FROM langchain_pg_embedding e, q
+            WHERE e.collection_id = (SELECT uuid FROM collection) {scope}
+              AND e.document_tsv @@ q.query
+            ORDER BY ts_rank_cd(e.document_tsv, q.query, 32) DESC
+            LIMIT :candidates
+        ),
+        fused AS (
+            SELECT COALESCE(v.id, l.id) AS id,
+                   COALESCE(1.0 / (:rrf_k + v.rank), 0.0)
+                   + COALESCE(1.0 / (:rrf_k + l.rank), 0.0) AS score
+            FROM vector_hits v
+            FULL OUTER JOIN lexical_hits l ON v.id = l.id
+        )
+        SELECT e.id, e.document, e.cmetadata, f.score
+        FROM fused f
+        JOIN langchain_pg_embedding e ON e.id = f.id
+        ORDER BY f.score DESC
+        LIMIT :k
+        """
+    )
+
+
+HYBRID_SQL = _hybrid_sql(scoped=False)
+SCOPED_HYBRID_SQL = _hybrid_sql(scoped=True)
+
+
+def fulltext_column_exists(cur) -> bool:
+    cur.execute(
+        """
+        SELECT 1
+        FROM pg_attribute
+        WHERE attrelid = 'langchain_pg_embedding'::regclass
+          AND attname = 'document_tsv' AND NOT attisdropped
+        """
+    )
+    return cur.fetchone() is not None
+
+
+@lru_cache(maxsize=1)
+def fulltext_available() -> bool:
+    """Whether hybrid search can run; checked once per process."""
+    with get_connection() as conn, conn.cursor() as cur:
+        exists = fulltext_column_exists(cur)
+    if not exists:
+        print("langchain_pg_embedding.document_tsv is missing, falling back to vector search; "
+              "run `python -m src.boardgame_agents.rag.vector_index migrate` to enable hybrid mode")
+    return exists
+
+
+def migrate_fulltext_column() -> None:
+    """Add the generated tsvector column; rewrites and locks the table while it runs."""
+    with get_connection() as conn, conn.cursor() as cur:
+        if fulltext_column_exists(cur):
+            print("document_tsv column already exists")
+            return
+        start = time.perf_counter()
+        cur.execute(
+            f"""
+            ALTER TABLE langchain_pg_embedding
+            ADD COLUMN document_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', coalesce(document, ''))) STORED
+            """
+        )
+    print(f"Added document_tsv column in {time.perf_counter() - start:.2f}s")
+
+
+def ensure_fulltext_index() -> Dict[str, Any]:
+    """Build the GIN index over document_tsv if missing, without blocking writes."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with get_connection(autocommit=True) as conn, conn.cursor() as cur:
+        # adding a STORED generated column rewrites the table, so like the
+        # vector dims it is left to the explicit migrate step
+        if not fulltext_column_exists(cur):
+            raise RuntimeError(
+                "langchain_pg_embedding.document_tsv is missing. Adding it rewrites and locks "
+                "the table; run `python -m src.boardgame_agents.rag.vector_index migrate` "
+                "in a maintenance window first."
+            )
+        start = time.perf_counter()
+        cur.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_tsv "
+            "ON langchain_pg_embedding USING gin (document_tsv)"
+        )
+        build_seconds = time.perf_counter() - start
+
+        cur.execute("SELECT pg_size_pretty(pg_relation_size('ix_document_tsv'))")
+        size = cur.fetchone()[0]
+
+    print(f"Full-text index ready in {build_seconds:.2f}s ({size})")
+    return {"index": "ix_document_tsv", "size": size, "build_seconds": round(build_seconds, 3)}
+
+
+class HybridRetriever(BaseRetriever):
+    """Vector + full-text search fused with reciprocal rank fusion in one query.
+
+    Each arm returns its top `candidates`; exact terms such as card or phase
+    names surface through the lexical arm even when the embedding misses them.
+    """
+
+    embeddings: Embeddings
+    game_name: Optional[str] = None
+    k: int = 5
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = RRF_K
+    collection_name: str = "chunks"
+    min_results: int = SCOPED_MIN_RESULTS
+    connect_options: str = ""
+
+    def _params(self, query: str, embedding: List[float]) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "collection": self.collection_name,
+            "scope": json.dumps({"document_name": self.game_name}),
+            "embedding": str(embedding),
+            "candidates": self.candidates,
+            "rrf_k": self.rrf_k,
+            "k": self.k,
+        }
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        params = self._params(query, self.embeddings.embed_query(query))
+
+        with get_engine(self.connect_options).connect() as conn:
+            docs: List[Document] = []
+            if self.game_name:
+                docs = _to_documents(conn.execute(SCOPED_HYBRID_SQL, params))
+            if len(docs) < self.min_results or not self.game_name:
+                docs = _merge_results(
+                    docs, _to_documents(conn.execute(HYBRID_SQL, params)), self.k
+                )
+        return docs
+
+    async def asearch(self, query: str, embedding: List[float]) -> List[Document]:
+        """Search with a precomputed query embedding."""
+        params = self._params(query, embedding)
+
+        async with get_async_engine(self.connect_options).connect() as conn:
+            docs: List[Document] = []
+            if self.game_name:
+                docs = _to_documents(await conn.execute(SCOPED_HYBRID_SQL, params))
+            if len(docs) < self.min_results or not self.game_name:
+                docs = _merge_results(
+                    docs, _to_documents(await conn.execute(HYBRID_SQL, params)), self.k
+                )
+        return docs
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return await self.asearch(query, await self.embeddings.aembed_query(query))
+
+
+if __name__ == "__main__":
+    ensure_fulltext_index()
@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+PROFILE_SLOW_REQUESTS = os.getenv("PROFILE_SLOW_REQUESTS", "0") == "1"
+PROFILE_THRESHOLD_SECONDS = float(os.getenv("PROFILE_THRESHOLD_SECONDS", "2.0"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (self.max,), self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class StageTimings:
+    """Latency histograms keyed by pipeline stage, e.g. rewrite / rerank / generate."""
+
+    def __init__(self, metric_name: str, label: str = "stage"):
+        self.metric_name = metric_name
+        self.label = label
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean_seconds": round(h.sum / h.count, 4) if h.count else 0.0,
+                    "p50_seconds": round(h.quantile(0.5), 4),
+                    "p95_seconds": round(h.quantile(0.95), 4),
+                    "max_seconds": round(h.max, 4),
+                }
+                for stage, h in self._histograms.items()
+            }
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.metric_name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(
+                        f'{self.metric_name}_bucket{{{self.label}="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(
+                    f'{self.metric_name}_bucket{{{self.label}="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{self.metric_name}_sum{{{self.label}="{stage}"}} {h.sum}')
+                lines.append(f'{self.metric_name}_count{{{self.label}="{stage}"}} {h.count}')
+        return lines
+
+
+pipeline_timings = StageTimings("rag_stage_seconds")
+ingest_timings = StageTimings("ingest_stage_seconds")
+request_timings = StageTimings("http_request_seconds", label="path")
+
+
+def render_prometheus(gauges: Optional[Dict[str, float]] = None) -> str:
+    lines: List[str] = []
+    for timings in (request_timings, pipeline_timings, ingest_timings):
+        lines.extend(timings.render())
+    for name, value in (gauges or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples every thread's stack while at least one profiled request runs.
+
+    Samples are timestamped in a ring buffer; when a request turns out to be
+    slow, the samples taken during it are written as collapsed stacks
+    ("frame;frame;frame count"), ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILE_INTERVAL_SECONDS,
+        threshold: float = PROFILE_THRESHOLD_SECONDS,
+        out_dir: str = PROFILE_DIR,
+        max_samples: int = 200_000,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.out_dir = Path(out_dir)
+        self._samples: "deque[Tuple[float, str]]" = deque(maxlen=max_samples)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while self._active:
+            now = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread = names.get(ident, str(ident))
+                self._samples.append((now, ";".join([thread] + stack[::-1])))
+            time.sleep(self.interval)
+
+    @contextmanager
+    def profile(self, label: Union[str, Callable[[], str]]):
+        with self._lock:
+            self._active += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._active -= 1
+            if end - start >= self.threshold:
+                self.dump(_resolve(label), start, end)
+
+    def dump(self, label: str, start: float, end: float) -> Path:
+        stacks = Counter(s for t, s in list(self._samples) if start <= t <= end)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        path = self.out_dir / f"{int(time.time() * 1000)}_{safe_label}.folded"
+        path.write_text("\n".join(f"{s} {n}" for s, n in stacks.most_common()) + "\n")
+        print(f"Slow request {label} took {end - start:.2f}s, stacks in {path}")
+        return path
+
+
+profiler = SamplingProfiler() if PROFILE_SLOW_REQUESTS else None
+
+
+def _resolve(label: Union[str, Callable[[], str]]) -> str:
+    return label() if callable(label) else label
+
+
+@contextmanager
+def request_span(label: Union[str, Callable[[], str]]):
+    """Times a whole request and, when profiling is on, samples it.
+
+    A callable label is resolved when the request ends, e.g. to read the
+    route that matched.
+    """
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            with profiler.profile(label):
+                yield
+        else:
+            yield
+    finally:
+        request_timings.record(_resolve(label), time.perf_counter() - start)
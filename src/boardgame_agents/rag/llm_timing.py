@@ -0,0 +1,67 @@
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.boardgame_agents.rag.instrumentation import StageTimings, pipeline_timings
+
+
+class LLMTimingCallback(BaseCallbackHandler):
+    """Times LLM calls per stage tag, plus time to the first streamed token.
+
+    The stage is the first tag of the call found in `stages`, so the same
+    model can be tagged "rewrite" in one chain and "generate" in another.
+    Calls are recorded as "<stage>_llm" so they never double-count a stage
+    that is also timed as a whole, like AdaptiveRewriteRetriever's "rewrite".
+    """
+
+    # run on the event loop in async chains instead of a worker thread, so
+    # first-token times aren't skewed by executor scheduling
+    run_inline = True
+
+    def __init__(self, timings: StageTimings = pipeline_timings,
+                 stages: Tuple[str, ...] = ("rewrite", "generate")):
+        self.timings = timings
+        self.stages = stages
+        self._runs: Dict[UUID, Tuple[str, float, bool]] = {}
+        # sync chains call the handler from several threads at once
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, tags: Optional[List[str]]) -> None:
+        stage = next((t for t in (tags or []) if t in self.stages), "llm")
+        with self._lock:
+            self._runs[run_id] = (stage, time.perf_counter(), False)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID,
+                            tags: Optional[List[str]] = None, **kwargs: Any) -> None:
+        self._start(run_id, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID,
+                     tags: Optional[List[str]] = None, **kwargs: Any) -> None:
+        self._start(run_id, tags)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            run = self._runs.get(run_id)
+            if not run or run[2]:
+                return
+            stage, start, _ = run
+            self._runs[run_id] = (stage, start, True)
+        self.timings.record(f"{stage}_first_token", now - start)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run:
+            self.timings.record(f"{run[0]}_llm", now - run[1])
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+llm_timing_callback = LLMTimingCallback()
@@ -0,0 +1,210 @@
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CROSS_ENCODER_MODEL = os.getenv(
+    "CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+TOKENIZER_MODEL = os.getenv("TOKENIZER_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+# comma separated subset of embeddings,cross_encoder,tokenizer
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "")
+# "torch", "onnx" (fp32 ONNX Runtime) or "onnx-int8" (dynamically quantized)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# avx2 runs on any x86-64 server; avx512_vnni / arm64 are faster where supported
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+
+
+def _canonical(model_name: str) -> str:
+    # sentence-transformers resolves bare names to its own namespace
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _torch_module(model: Any) -> Optional[Any]:
+    # HuggingFaceEmbeddings wraps the SentenceTransformer in ._client,
+    # CrossEncoder wraps the transformers model in .model
+    for attr in ("_client", "client", "model"):
+        inner = getattr(model, attr, None)
+        if inner is not None and hasattr(inner, "parameters"):
+            return inner
+    return model if hasattr(model, "parameters") else None
+
+
+def _parameter_bytes(model: Any) -> int:
+    module = _torch_module(model)
+    if module is None:
+        return 0
+    return sum(p.numel() * p.element_size() for p in module.parameters())
+
+
+class ModelRegistry:
+    """Process-wide, lazily populated store of loaded models.
+
+    Each model is loaded at most once; concurrent first callers of the same
+    key wait on a per-key lock while other keys load in parallel.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        if key in self._models:
+            return self._models[key]
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._models:
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                model = loader()
+                load_seconds = time.perf_counter() - start
+                rss_after = _rss_bytes()
+
+                self._stats[key] = {
+                    "load_seconds": round(load_seconds, 3),
+                    "parameter_bytes": _parameter_bytes(model),
+                    "rss_delta_bytes": (
+                        rss_after - rss_before
+                        if rss_before is not None and rss_after is not None
+                        else None
+                    ),
+                }
+                self._models[key] = model
+                print(f"Loaded {key} in {load_seconds:.2f}s")
+
+        return self._models[key]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return dict(self._stats)
+
+    def freeze(self) -> None:
+        """Put every loaded torch model in inference mode without gradients.
+
+        Nothing then writes to the weight tensors, so pages inherited by
+        forked workers stay shared.
+        """
+        for model in self._models.values():
+            module = _torch_module(model)
+            if module is None:
+                continue
+            module.eval()
+            for p in module.parameters():
+                p.requires_grad_(False)
+
+
+registry = ModelRegistry()
+
+
+def _registry_key(kind: str, model_name: str, backend: str) -> str:
+    # torch keeps the old keys so existing stats and warm-ups line up
+    return f"{kind}:{model_name}" if backend == "torch" else f"{kind}:{model_name}:{backend}"
+
+
+def export_quantized_onnx(model_cls, model_name: str, quantization: str = ONNX_QUANTIZATION) -> Tuple[str, str]:
+    """Export `model_name` to ONNX with int8 dynamic quantization, once.
+
+    Returns the local model directory and the quantized file inside it.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    target = Path(ONNX_MODEL_DIR) / model_name.replace("/", "__")
+    # without an explicit suffix the file is named after the weights dtype
+    # (quint8 for avx2, qint8 otherwise)
+    file_suffix = f"qint8_{quantization}"
+    file_name = f"onnx/model_{file_suffix}.onnx"
+    if not (target / file_name).exists():
+        print(f"Exporting {model_name} to {target / file_name}")
+        model = model_cls(model_name, backend="onnx")
+        model.save_pretrained(str(target))
+        export_dynamic_quantized_onnx_model(
+            model, quantization, str(target), file_suffix=file_suffix)
+    return str(target), file_name
+
+
+def _backend_kwargs(model_cls, model_name: str, backend: str) -> Tuple[str, Dict[str, Any]]:
+    if backend == "torch":
+        return model_name, {}
+    if backend == "onnx":
+        return model_name, {"backend": "onnx"}
+    if backend == "onnx-int8":
+        path, file_name = export_quantized_onnx(model_cls, model_name)
+        return path, {"backend": "onnx", "model_kwargs": {"file_name": file_name}}
+    raise ValueError(f"Unknown INFERENCE_BACKEND {backend!r}")
+
+
+def get_embeddings(
+    model_name: str = EMBED_MODEL,
+    backend: str = INFERENCE_BACKEND,
+    encode_kwargs: Optional[Dict[str, Any]] = None,
+):
+    """Shared embeddings; `encode_kwargs` (e.g. batch_size) yield a copy over the same model."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from sentence_transformers import SentenceTransformer
+
+    model_name = _canonical(model_name)
+
+    def load():
+        path, kwargs = _backend_kwargs(SentenceTransformer, model_name, backend)
+        return HuggingFaceEmbeddings(model_name=path, model_kwargs=kwargs)
+
+    embeddings = registry.get(_registry_key("embeddings", model_name, backend), load)
+    if not encode_kwargs:
+        return embeddings
+    # shallow copy: the loaded SentenceTransformer is shared, only encode settings differ
+    return embeddings.model_copy(
+        update={"encode_kwargs": {**embeddings.encode_kwargs, **encode_kwargs}})
+
+
+def get_cross_encoder(model_name: str = CROSS_ENCODER_MODEL, backend: str = INFERENCE_BACKEND):
+    from sentence_transformers import CrossEncoder
+
+    def load():
+        path, kwargs = _backend_kwargs(CrossEncoder, model_name, backend)
+        return CrossEncoder(path, **kwargs)
+
+    return registry.get(_registry_key("cross_encoder", model_name, backend), load)
+
+
+def get_tokenizer(model_name: str = TOKENIZER_MODEL):
+    from transformers import AutoTokenizer
+
+    return registry.get(
+        f"tokenizer:{model_name}",
+        lambda: AutoTokenizer.from_pretrained(model_name),
+    )
+
+
+def warm_up(models: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Eagerly load the models named in `models` (defaults to MODEL_WARMUP)."""
+    loaders = {
+        "embeddings": get_embeddings,
+        "cross_encoder": get_cross_encoder,
+        "tokenizer": get_tokenizer,
+    }
+    names = [m.strip() for m in (models or MODEL_WARMUP).split(",") if m.strip()]
+    for name in names:
+        loaders[name]()
+    return registry.stats()
+
+
+def model_stats() -> Dict[str, Dict[str, float]]:
+    return registry.stats()
@@ -1,19 +1,31 @@
 from dotenv import load_dotenv
 import os
-from typing import List
+import asyncio
+from typing import List, Optional
 
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_postgres import PGVector
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables import Runnable
 from langchain_core.documents import Document
 
-from sentence_transformers import CrossEncoder
 from langchain_openai import ChatOpenAI
 
+from src.boardgame_agents.rag.rerank_service import get_rerank_engine
+from src.boardgame_agents.rag.vector_index import connect_options
+from src.boardgame_agents.rag.db_utils import get_async_engine, get_engine
+from src.boardgame_agents.rag.scoped_retrieval import GameScopedRetriever
+from src.boardgame_agents.rag.hybrid_retrieval import HybridRetriever, fulltext_available
+from src.boardgame_agents.rag.model_registry import CROSS_ENCODER_MODEL, get_embeddings
+from src.boardgame_agents.rag.instrumentation import pipeline_timings
+
 load_dotenv()
 
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# "vector" or "hybrid" (vector + Postgres full-text, fused with RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+
 
 def extend_chathistory(chat_history, user_input, llm_answer):
     chat_history.extend([
@@ -23,55 +35,138 @@ def extend_chathistory(chat_history, user_input, llm_answer):
     return chat_history
 
 
-def get_retriever(k: int = 5):
-    PG_DSN = os.getenv("DB_DSN")
-    print(PG_DSN)
-    EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
-
-    embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-
-    vectorstore = PGVector(
-        connection=PG_DSN,
-        embeddings=embeddings,
-        collection_name="chunks",
-    )
+def get_retriever(
+    k: int = 5,
+    async_mode: bool = False,
+    game_name: Optional[str] = None,
+    hybrid: bool = RETRIEVAL_MODE == "hybrid",
+    embed_model: str = EMBED_MODEL,
+):
+    embeddings = get_embeddings(embed_model)
+
+    if hybrid and fulltext_available():
+        return HybridRetriever(
+            embeddings=embeddings,
+            game_name=game_name,
+            k=k,
+            connect_options=connect_options(k),
+        )
+
+    if game_name:
+        # filter pushed into SQL, falls back to all games when nothing matches
+        return GameScopedRetriever(
+            embeddings=embeddings,
+            game_name=game_name,
+            k=k,
+            connect_options=connect_options(k),
+        )
+
+    if async_mode:
+        # shared async pool; only ainvoke/astream are usable on this store
+        vectorstore = PGVector(
+            connection=get_async_engine(connect_options(k)),
+            embeddings=embeddings,
+            collection_name="chunks",
+            async_mode=True,
+        )
+    else:
+        # ef_search / probes follow k so the ANN index keeps enough recall
+        vectorstore = PGVector(
+            connection=get_engine(connect_options(k)),
+            embeddings=embeddings,
+            collection_name="chunks",
+        )
 
     return vectorstore.as_retriever(search_kwargs={"k": k})
 
 
 class Reranker(Runnable):
-    """Reranker using a cross-encoder."""
+    """Reranker using a cross-encoder.
+
+    Scoring goes through a shared `RerankEngine`, so concurrent callers are
+    batched together and repeated (query, chunk) pairs are served from cache.
+    """
 
     def __init__(
         self,
         retriever: Runnable,
-        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        model_name: str = CROSS_ENCODER_MODEL,
         top_k: int = 5,
     ):
 
         self.retriever = retriever
         self.top_k = top_k
         self.model_name = model_name
-        self.model = CrossEncoder(model_name)
+        self.engine = get_rerank_engine(model_name)
+        self.model = self.engine.model
 
     def invoke(self, query: str, config=None) -> List[Document]:
-        docs: List[Document] = self.retriever.invoke(query, config=config)
+        with pipeline_timings.time("vector_search"):
+            docs: List[Document] = self.retriever.invoke(query, config=config)
         if not docs:
             return docs
 
-        pairs = [(query, d.page_content) for d in docs]
-        scores = self.model.predict(pairs)
+        with pipeline_timings.time("rerank"):
+            scores = self.engine.score(query, docs)
+        return self._top_k(docs, scores)
 
+    async def ainvoke(self, query: str, config=None, **kwargs) -> List[Document]:
+        with pipeline_timings.time("vector_search"):
+            docs: List[Document] = await self.retriever.ainvoke(query, config=config)
+        if not docs:
+            return docs
+
+        # scoring is CPU bound, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        with pipeline_timings.time("rerank"):
+            scores = await loop.run_in_executor(None, self.engine.score, query, docs)
+        return self._top_k(docs, scores)
+
+    def _top_k(self, docs: List[Document], scores: List[float]) -> List[Document]:
         ranked = sorted(zip(docs, scores), key=lambda x: x[1], reverse=True)
         return [d for d, _ in ranked[: self.top_k]]
 
 
-def get_reranked_retriever(initial_k: int = 5, final_k: int = 2) -> Reranker:
-    base = get_retriever(k=initial_k)
-    return Reranker(base, top_k=final_k)
+def pack_documents(
+    docs: List[Document], token_budget: int = CONTEXT_TOKEN_BUDGET
+) -> List[Document]:
+    """Keep the best-ranked docs whose stored token counts fit the budget.
+
+    Uses the `token_count` written at ingestion, so nothing is tokenized at
+    query time; chunks from before it existed fall back to ~4 chars a token.
+    """
+    packed, used = [], 0
+    with pipeline_timings.time("pack_context"):
+        for doc in docs:
+            n_tokens = doc.metadata.get("token_count") or len(doc.page_content) // 4
+            if packed and used + n_tokens > token_budget:
+                break
+            packed.append(doc)
+            used += n_tokens
+    return packed
+
+
+def get_reranked_retriever(
+    initial_k: int = 5,
+    final_k: int = 2,
+    async_mode: bool = False,
+    game_name: Optional[str] = None,
+    hybrid: bool = RETRIEVAL_MODE == "hybrid",
+    embed_model: str = EMBED_MODEL,
+    cross_encoder_model: str = CROSS_ENCODER_MODEL,
+) -> Reranker:
+    base = get_retriever(
+        k=initial_k, async_mode=async_mode, game_name=game_name, hybrid=hybrid,
+        embed_model=embed_model)
+    return Reranker(base, model_name=cross_encoder_model, top_k=final_k)
 
 
 def get_llm_model(temperature=0):
+    if os.getenv("LLM_MODEL") == "fake":
+        # offline, deterministic stand-in used by the benchmarks
+        from src.boardgame_agents.benchmark.fake_llm import FakeChatModel
+        return FakeChatModel()
+
     return ChatOpenAI(
         model=os.getenv("LLM_MODEL"),
         openai_api_key=os.getenv('OPENROUTER_API_KEY'),
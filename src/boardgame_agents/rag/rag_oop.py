@@ -1,79 +1,187 @@
-from pydantic import BaseModel
-from typing import Dict, List, Any
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Iterable, List, Any, Optional
 
 from langchain_classic.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_classic.chains.retrieval import create_retrieval_chain
 from langchain.chat_models import init_chat_model
-from langchain_classic.chains import create_history_aware_retriever
+from langchain_core.messages import BaseMessage
 
 from src.boardgame_agents.rag.prompt_templates_rag import (
     get_history_aware_message,
     get_qa_message,
 )
-from src.boardgame_agents.rag.rag_helpers import extend_chathistory, get_reranked_retriever, get_llm_model
-
-# ---------- Pydantic models ----------
-
+from src.boardgame_agents.rag.rag_helpers import (
+    EMBED_MODEL,
+    extend_chathistory,
+    get_embeddings,
+    get_llm_model,
+    get_reranked_retriever,
+    pack_documents,
+)
+from src.boardgame_agents.rag.schemas import ChatRequest, ChatResponse  # noqa: F401
+from src.boardgame_agents.rag.history_store import ChatHistoryStore
+from src.boardgame_agents.rag.semantic_cache import SemanticCache
+from src.boardgame_agents.rag.adaptive_rewrite import (
+    AdaptiveRewriteRetriever,
+    RewriteCache,
+)
+from src.boardgame_agents.rag.batch_qa import BatchQA
+from src.boardgame_agents.rag.instrumentation import pipeline_timings
+from src.boardgame_agents.rag.llm_timing import llm_timing_callback
 
-class ChatRequest(BaseModel):
-    user_id: str
-    message: str
+RAG_CHAIN_CACHE_SIZE = int(os.getenv("RAG_CHAIN_CACHE_SIZE", "32"))
+RAG_WARMUP_GAMES = [
+    g.strip() for g in os.getenv("RAG_WARMUP_GAMES", "").split(",") if g.strip()
+]
 
+class RAGService:
+    def __init__(self, chain_cache_size: int = RAG_CHAIN_CACHE_SIZE) -> None:
+        self.llm = get_llm_model()
 
-class ChatResponse(BaseModel):
-    answer: str
+        self.context_q_prompt = get_history_aware_message()
+        self.document_prompt = PromptTemplate.from_template(
+            "From {source} (page {page}):\n{page_content}"
+        )
 
+        self.chain_cache_size = chain_cache_size
+        self._chains: "OrderedDict[str, Any]" = OrderedDict()
+        self._chains_lock = threading.Lock()
 
-class RAGService:
-    def __init__(self) -> None:
-        self.llm = get_llm_model()
-        self.retriever = get_reranked_retriever()
+        self.chat_histories = ChatHistoryStore()
+        self.answer_cache = SemanticCache(get_embeddings(EMBED_MODEL))
+        # shared by every game's chain
+        self.rewrite_cache = RewriteCache()
+        self.timings = pipeline_timings
+        self.batch_qa = BatchQA(self.llm, cache_size=chain_cache_size)
 
     def insert_game_to_database(game_name, session_id):
         pass
 
-    def add_game_to_context(self, game_name: str):
-        context_q_prompt = get_history_aware_message()
-        qa_prompt = get_qa_message(game_name, add_context=True)
-
-        self.history_aware_retriever = create_history_aware_retriever(
-            self.llm, self.retriever, context_q_prompt
-        )
-
-        document_prompt = PromptTemplate.from_template(
-            "From {source} (page {page}):\n{page_content}"
+    def _build_chain(self, game_name: str):
+        # retrieval is scoped to the game's own rulebook chunks
+        retriever = get_reranked_retriever(async_mode=True, game_name=game_name)
+        # rewrites the query with the LLM only when the history matters
+        history_aware_retriever = AdaptiveRewriteRetriever(
+            # tags tell the LLM timing callback which stage a call belongs to
+            self.llm.with_config(tags=["rewrite"]),
+            retriever,
+            self.context_q_prompt,
+            cache=self.rewrite_cache,
+            timings=self.timings,
         )
+        qa_prompt = get_qa_message(game_name, add_context=True)
 
         question_answer_chain = create_stuff_documents_chain(
-            self.llm,
+            self.llm.with_config(tags=["generate"]),
             qa_prompt,
-            document_prompt=document_prompt,
+            document_prompt=self.document_prompt,
             document_separator="\n\n---\n\n",
         )
 
-        self.rag_chain = create_retrieval_chain(
-            self.history_aware_retriever,
+        return create_retrieval_chain(
+            history_aware_retriever | RunnableLambda(pack_documents),
             question_answer_chain,
         )
 
-    def _get_history_for_user(self, user_id: str) -> List[Dict[str, Any]]:
-        return self.chat_histories.get(user_id, [])
-
-    def _set_history_for_user(self, user_id: str, history: List[Dict[str, Any]]) -> None:
-        # change later to insert to db
-        self.chat_histories[user_id] = history
+    def get_chain(self, game_name: str):
+        """Return the prebuilt chain for a game, building it on first use."""
+        with self._chains_lock:
+            if game_name in self._chains:
+                self._chains.move_to_end(game_name)
+                return self._chains[game_name]
 
-    def chat(self, user_id: str, user_input: str) -> str:
-        # chat_history = self._get_history_for_user(user_id)
-        chat_history = []
+            chain = self._build_chain(game_name)
+            self._chains[game_name] = chain
+            while len(self._chains) > self.chain_cache_size:
+                self._chains.popitem(last=False)
+            return chain
 
-        response = self.rag_chain.invoke(
-            {"input": user_input, "chat_history": chat_history}
-        )
-        answer = response["answer"]
+    def add_game_to_context(self, game_name: str):
+        self.get_chain(game_name)
+        # the game may have just been (re-)ingested
+        self.answer_cache.invalidate(game_name)
+
+    def warm_up(self, game_names: Iterable[str] = RAG_WARMUP_GAMES) -> None:
+        for game_name in game_names:
+            self.get_chain(game_name)
+
+    async def _get_history_for_user(self, user_id: Optional[str]) -> List[BaseMessage]:
+        return await self.chat_histories.load(user_id)
+
+    async def _set_history_for_user(
+        self, user_id: Optional[str], history: List[BaseMessage]
+    ) -> None:
+        await self.chat_histories.save(user_id, history)
+
+    async def chat(self, user_id: Optional[str], user_input: str, game_name: str) -> str:
+        with self.timings.time("history_load"):
+            chat_history = await self._get_history_for_user(user_id)
+
+        # answers only depend on the question itself on the first turn
+        answer, question_vector = None, None
+        if not chat_history:
+            start = time.perf_counter()
+            with self.timings.time("cache_lookup"):
+                answer, question_vector = await self.answer_cache.lookup(
+                    game_name, user_input)
+
+        if answer is None:
+            with self.timings.time("chain"):
+                response = await self.get_chain(game_name).ainvoke(
+                    {"input": user_input,
+                     "chat_history": self.chat_histories.window(chat_history)},
+                    config={"callbacks": [llm_timing_callback]},
+                )
+            answer = response["answer"]
+
+            if question_vector is not None:
+                await self.answer_cache.store(
+                    game_name, question_vector, answer, time.perf_counter() - start)
 
         new_history = extend_chathistory(chat_history, user_input, answer)
-        # self._set_history_for_user(user_id, new_history)
+        await self._set_history_for_user(user_id, new_history)
 
         return answer
+
+    async def stream_chat(
+        self, user_id: Optional[str], user_input: str, game_name: str
+    ) -> AsyncIterator[str]:
+        """Yield answer tokens as the LLM produces them."""
+        with self.timings.time("history_load"):
+            chat_history = await self._get_history_for_user(user_id)
+
+        cached, question_vector = None, None
+        if not chat_history:
+            start = time.perf_counter()
+            with self.timings.time("cache_lookup"):
+                cached, question_vector = await self.answer_cache.lookup(
+                    game_name, user_input)
+
+        tokens = []
+        if cached is not None:
+            tokens.append(cached)
+            yield cached
+        else:
+            async for chunk in self.get_chain(game_name).astream(
+                {"input": user_input,
+                 "chat_history": self.chat_histories.window(chat_history)},
+                config={"callbacks": [llm_timing_callback]},
+            ):
+                # retrieval chain streams input/context first, then answer deltas
+                if token := chunk.get("answer"):
+                    tokens.append(token)
+                    yield token
+
+            if question_vector is not None:
+                await self.answer_cache.store(
+                    game_name, question_vector, "".join(tokens),
+                    time.perf_counter() - start)
+
+        new_history = extend_chathistory(
+            chat_history, user_input, "".join(tokens))
+        await self._set_history_for_user(user_id, new_history)
@@ -0,0 +1,183 @@
+import os
+import re
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.boardgame_agents.rag.model_registry import get_cross_encoder
+
+
+RERANK_MAX_BATCH_SIZE = int(os.getenv("RERANK_MAX_BATCH_SIZE", "64"))
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def chunk_key(doc: Document) -> str:
+    # PGVector fills in the row id; fall back to the content for in-memory docs
+    if doc.id:
+        return doc.id
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class PairScoreCache:
+    """Bounded LRU cache of cross-encoder scores keyed by (chunk id, normalized query)."""
+
+    def __init__(self, max_size: int = RERANK_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._data.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key: Tuple[str, str], score: float) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = score
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RerankEngine:
+    """Scores (query, chunk) pairs for many callers in shared micro-batches.
+
+    Callers block on `score`; a single worker thread drains the queue, waits at
+    most `max_wait_ms` for more requests to arrive and runs one
+    `CrossEncoder.predict` for up to `max_batch_size` pairs.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_batch_size: int = RERANK_MAX_BATCH_SIZE,
+        max_wait_ms: float = RERANK_MAX_WAIT_MS,
+        cache_size: int = RERANK_CACHE_SIZE,
+    ):
+        self.model_name = model_name
+        self.model = get_cross_encoder(model_name)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache = PairScoreCache(cache_size)
+
+        self.batches = 0
+        self.pairs_scored = 0
+
+        self._queue: "Queue[Tuple[List[Tuple[str, str]], Future]]" = Queue()
+        self._worker = threading.Thread(
+            target=self._run, name=f"rerank-{model_name}", daemon=True
+        )
+        self._worker.start()
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        return self.score_many([(query, docs)])[0]
+
+    def score_many(self, requests: List[Tuple[str, List[Document]]]) -> List[List[float]]:
+        """Score many (query, docs) requests as one queue item, so they share batches."""
+        # flattened to one (query, doc) pair per doc, regrouped at the end; the
+        # model sees the query as typed, only the cache key is normalized
+        pairs = [(q, d) for q, docs in requests for d in docs]
+        keys = [(chunk_key(d), normalize_query(q)) for q, d in pairs]
+        scores: List[Optional[float]] = [self.cache.get(k) for k in keys]
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            future: Future = Future()
+            self._queue.put(
+                ([(pairs[i][0], pairs[i][1].page_content) for i in missing], future)
+            )
+            for i, s in zip(missing, future.result()):
+                scores[i] = s
+                self.cache.put(keys[i], s)
+
+        grouped, offset = [], 0
+        for _, docs in requests:
+            grouped.append(scores[offset: offset + len(docs)])
+            offset += len(docs)
+        return grouped
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "pairs_scored": self.pairs_scored,
+            "cache_size": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        n_pairs = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while n_pairs < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            batch.append(item)
+            n_pairs += len(item[0])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # identical pairs from concurrent callers are scored once
+            unique: Dict[Tuple[str, str], int] = {}
+            for pairs, _ in batch:
+                for pair in pairs:
+                    unique.setdefault(pair, len(unique))
+
+            try:
+                raw = self.model.predict(
+                    list(unique), batch_size=self.max_batch_size
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.pairs_scored += len(unique)
+
+            for pairs, future in batch:
+                future.set_result([float(raw[unique[p]]) for p in pairs])
+
+
+_engines: Dict[str, RerankEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_rerank_engine(model_name: str) -> RerankEngine:
+    with _engines_lock:
+        if model_name not in _engines:
+            _engines[model_name] = RerankEngine(model_name)
+        return _engines[model_name]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+# ---------- Pydantic models ----------
+
+
+class ChatRequest(BaseModel):
+    user_id: str
+    message: str
+
+
+class ChatResponse(BaseModel):
+    answer: str
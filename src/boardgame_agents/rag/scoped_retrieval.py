@@ -0,0 +1,143 @@
+import os
+import json
+import argparse
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from src.boardgame_agents.rag.db_utils import get_async_engine, get_engine
+
+
+SCOPED_MIN_RESULTS = int(os.getenv("SCOPED_MIN_RESULTS", "1"))
+
+# Left to itself the planner may walk the HNSW index in distance order and
+# apply `@>` afterwards, which only sees ~ef_search rows across all games.
+# The MATERIALIZED CTE pins the game filter (ix_cmetadata_gin) first; one
+# game's chunks are few enough to rank exactly.
+SCOPED_SEARCH_SQL = text(
+    """
+    WITH game_rows AS MATERIALIZED (
+        SELECT e.id, e.document, e.cmetadata, e.embedding
+        FROM langchain_pg_embedding e
+        JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+        WHERE c.name = :collection
+          AND e.cmetadata @> CAST(:scope AS jsonb)
+    )
+    SELECT id, document, cmetadata
+    FROM game_rows
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :k
+    """
+)
+
+UNSCOPED_SEARCH_SQL = text(
+    """
+    SELECT e.id, e.document, e.cmetadata
+    FROM langchain_pg_embedding e
+    JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+    WHERE c.name = :collection
+    ORDER BY e.embedding <=> CAST(:embedding AS vector)
+    LIMIT :k
+    """
+)
+
+
+def _to_documents(rows) -> List[Document]:
+    return [
+        Document(id=row.id, page_content=row.document, metadata=row.cmetadata or {})
+        for row in rows
+    ]
+
+
+def _merge_results(scoped: List[Document], unscoped: List[Document], k: int) -> List[Document]:
+    # scoped hits keep their place, the fallback only fills what is missing
+    seen = {d.id for d in scoped}
+    extra = [d for d in unscoped if d.id not in seen]
+    return (scoped + extra)[:k]
+
+
+class GameScopedRetriever(BaseRetriever):
+    """Vector search restricted to one game's chunks.
+
+    Falls back to a search across all games when the game has fewer than
+    `min_results` matches, e.g. because its rulebook was never ingested.
+    """
+
+    embeddings: Embeddings
+    game_name: Optional[str] = None
+    k: int = 5
+    collection_name: str = "chunks"
+    min_results: int = SCOPED_MIN_RESULTS
+    connect_options: str = ""
+
+    def _params(self, embedding: List[float]) -> Dict[str, Any]:
+        return {
+            "collection": self.collection_name,
+            "scope": json.dumps({"document_name": self.game_name}),
+            "embedding": str(embedding),
+            "k": self.k,
+        }
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        params = self._params(self.embeddings.embed_query(query))
+
+        with get_engine(self.connect_options).connect() as conn:
+            docs: List[Document] = []
+            if self.game_name:
+                docs = _to_documents(conn.execute(SCOPED_SEARCH_SQL, params))
+            if len(docs) < self.min_results or not self.game_name:
+                docs = _merge_results(
+                    docs, _to_documents(conn.execute(UNSCOPED_SEARCH_SQL, params)), self.k
+                )
+        return docs
+
+    async def asearch(self, query: str, embedding: List[float]) -> List[Document]:
+        """Search with a precomputed query embedding."""
+        params = self._params(embedding)
+
+        async with get_async_engine(self.connect_options).connect() as conn:
+            docs: List[Document] = []
+            if self.game_name:
+                docs = _to_documents(await conn.execute(SCOPED_SEARCH_SQL, params))
+            if len(docs) < self.min_results or not self.game_name:
+                docs = _merge_results(
+                    docs, _to_documents(await conn.execute(UNSCOPED_SEARCH_SQL, params)), self.k
+                )
+        return docs
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return await self.asearch(query, await self.embeddings.aembed_query(query))
+
+
+def explain_scoped_search(game_name: str, question: str, k: int = 5,
+                          collection_name: str = "chunks") -> str:
+    """EXPLAIN ANALYZE of the scoped search, to check the game filter runs first."""
+    from src.boardgame_agents.rag.model_registry import get_embeddings
+
+    retriever = GameScopedRetriever(
+        embeddings=get_embeddings(), game_name=game_name, k=k, collection_name=collection_name)
+    params = retriever._params(retriever.embeddings.embed_query(question))
+    with get_engine().connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {SCOPED_SEARCH_SQL.text}"), params)
+        return "\n".join(row[0] for row in rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the plan of the game-scoped vector search")
+    parser.add_argument("game_name")
+    parser.add_argument("question")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(explain_scoped_search(args.game_name, args.question, args.k))
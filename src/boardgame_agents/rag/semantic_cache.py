@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from langchain_core.embeddings import Embeddings
+
+from src.boardgame_agents.rag.db_utils import get_async_engine
+
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_PER_GAME = int(os.getenv("SEMANTIC_CACHE_MAX_PER_GAME", "1000"))
+# how often a game's chunk fingerprint is re-read to detect re-ingestion
+SEMANTIC_CACHE_VERSION_TTL = float(os.getenv("SEMANTIC_CACHE_VERSION_TTL", "60"))
+
+CORPUS_VERSION_SQL = text(
+    """
+    SELECT count(*) AS n, md5(string_agg(e.id, ',' ORDER BY e.id)) AS digest
+    FROM langchain_pg_embedding e
+    WHERE e.cmetadata @> CAST(:scope AS jsonb)
+    """
+)
+
+
+@dataclass
+class _Entry:
+    answer: str
+    created_at: float
+    compute_seconds: float
+    last_used: float
+
+
+@dataclass
+class _GameIndex:
+    """Normalized question embeddings for one game, one row per entry."""
+
+    version: Optional[str] = None
+    checked_at: float = 0.0
+    entries: List[_Entry] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
+
+    def add(self, vector: np.ndarray, entry: _Entry) -> None:
+        self.entries.append(entry)
+        row = vector[None, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.entries = [e for e, k in zip(self.entries, mask) if k]
+        self.vectors = self.vectors[mask] if self.entries else None
+
+
+class SemanticCache:
+    """Per-game cache of answers looked up by question embedding similarity.
+
+    Entries expire after `ttl` seconds, each game keeps at most `max_entries`
+    (least recently used evicted first), and a game's entries are dropped when
+    its chunks in `langchain_pg_embedding` change.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_PER_GAME,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._games: Dict[str, _GameIndex] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+    async def embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    async def _corpus_version(self, game_name: str) -> str:
+        async with get_async_engine().connect() as conn:
+            row = (
+                await conn.execute(
+                    CORPUS_VERSION_SQL,
+                    {"scope": json.dumps({"document_name": game_name})},
+                )
+            ).first()
+        return f"{row.n}:{row.digest}"
+
+    async def _check_version(self, game_name: str) -> None:
+        index = self._games.get(game_name)
+        if index is None or time.time() - index.checked_at < SEMANTIC_CACHE_VERSION_TTL:
+            return
+
+        version = await self._corpus_version(game_name)
+        with self._lock:
+            if index.version is not None and index.version != version:
+                self._games.pop(game_name, None)
+                self.invalidations += 1
+                return
+            index.version = version
+            index.checked_at = time.time()
+
+    async def lookup(self, game_name: str, question: str) -> Tuple[Optional[str], np.ndarray]:
+        """Return (cached answer or None, question embedding)."""
+        start = time.perf_counter()
+        vector = await self.embed(question)
+        await self._check_version(game_name)
+
+        with self._lock:
+            index = self._games.get(game_name)
+            if index is not None and index.entries:
+                now = time.time()
+                fresh = np.array([now - e.created_at < self.ttl for e in index.entries])
+                if not fresh.all():
+                    index.keep(fresh)
+
+            if index is None or not index.entries:
+                self.misses += 1
+                return None, vector
+
+            similarities = index.vectors @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None, vector
+
+            entry = index.entries[best]
+            entry.last_used = time.time()
+            self.hits += 1
+            self.seconds_saved += max(
+                0.0, entry.compute_seconds - (time.perf_counter() - start)
+            )
+            return entry.answer, vector
+
+    async def store(
+        self, game_name: str, vector: np.ndarray, answer: str, compute_seconds: float
+    ) -> None:
+        version = None
+        if game_name not in self._games:
+            # baseline fingerprint the later version checks compare against
+            version = await self._corpus_version(game_name)
+
+        now = time.time()
+        with self._lock:
+            index = self._games.setdefault(game_name, _GameIndex())
+            if index.version is None and version is not None:
+                index.version = version
+                index.checked_at = now
+            index.add(vector, _Entry(answer, now, compute_seconds, now))
+
+            if len(index.entries) > self.max_entries:
+                last_used = np.array([e.last_used for e in index.entries])
+                cutoff = np.sort(last_used)[-self.max_entries]
+                index.keep(last_used >= cutoff)
+
+    def invalidate(self, game_name: Optional[str] = None) -> None:
+        with self._lock:
+            if game_name is None:
+                self._games.clear()
+            else:
+                self._games.pop(game_name, None)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": round(self.seconds_saved, 3),
+            "invalidations": self.invalidations,
+            "entries": sum(len(i.entries) for i in self._games.values()),
+        }
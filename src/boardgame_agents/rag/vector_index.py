@@ -0,0 +1,221 @@
+import os
+import math
+import time
+import argparse
+from typing import Dict, Optional
+
+from src.boardgame_agents.rag.db_utils import get_connection
+from src.boardgame_agents.rag.hybrid_retrieval import migrate_fulltext_column
+
+
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw")
+EMBED_DIMS = int(os.getenv("EMBED_DIMS", "384"))  # all-MiniLM-L6-v2
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_MIN_PROBES = int(os.getenv("IVFFLAT_MIN_PROBES", "10"))
+INDEX_BUILD_MEM = os.getenv("INDEX_BUILD_MEM", "512MB")
+
+# PGVector's default distance strategy is cosine
+OPCLASS = "vector_cosine_ops"
+
+
+def index_name(method: str = VECTOR_INDEX_METHOD) -> str:
+    return f"ix_embedding_{method}"
+
+
+def recall_settings(k: int) -> Dict[str, int]:
+    """Per-query recall knobs sized from the number of neighbours requested."""
+    return {
+        # ef_search bounds the candidate list, so it must be at least k
+        "hnsw.ef_search": max(40, 4 * k),
+        "ivfflat.probes": max(IVFFLAT_MIN_PROBES, math.ceil(k / 2)),
+    }
+
+
+def connect_options(k: int) -> str:
+    """libpq `options` string applying `recall_settings` to every new connection."""
+    return " ".join(f"-c {name}={value}" for name, value in recall_settings(k).items())
+
+
+def count_embeddings(cur, collection_name: str = "chunks") -> int:
+    cur.execute(
+        """
+        SELECT count(*)
+        FROM langchain_pg_embedding e
+        JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+        WHERE c.name = %s
+        """,
+        (collection_name,),
+    )
+    return cur.fetchone()[0]
+
+
+def ivfflat_lists(n_rows: int) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+    if n_rows <= 1_000_000:
+        return max(1, n_rows // 1000)
+    return int(math.sqrt(n_rows))
+
+
+def embedding_column_type(cur) -> str:
+    cur.execute(
+        """
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'
+        """
+    )
+    return cur.fetchone()[0]
+
+
+def ensure_vector_dims(cur, dims: int = EMBED_DIMS) -> None:
+    # ANN indexes need a fixed dimension; PGVector creates an untyped column.
+    # Fixing it rewrites the table under an ACCESS EXCLUSIVE lock, which has
+    # no place in a CONCURRENTLY build, so it is left to `migrate_vector_dims`.
+    column_type = embedding_column_type(cur)
+    if column_type != f"vector({dims})":
+        raise RuntimeError(
+            f"langchain_pg_embedding.embedding is {column_type}, the index needs vector({dims}). "
+            "Changing it rewrites and locks the table; run "
+            "`python -m src.boardgame_agents.rag.vector_index migrate` in a maintenance window first."
+        )
+
+
+def migrate_vector_dims(dims: int = EMBED_DIMS) -> None:
+    """Type the embedding column as vector(dims); blocks reads and writes while it runs."""
+    with get_connection() as conn, conn.cursor() as cur:
+        column_type = embedding_column_type(cur)
+        if column_type == f"vector({dims})":
+            print(f"embedding column is already {column_type}")
+            return
+        start = time.perf_counter()
+        cur.execute(
+            f"ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector({dims})"
+        )
+    print(f"Changed embedding column from {column_type} to vector({dims}) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+def index_report(cur, method: str = VECTOR_INDEX_METHOD) -> Optional[Dict[str, str]]:
+    cur.execute(
+        """
+        SELECT pg_relation_size(c.oid), pg_size_pretty(pg_relation_size(c.oid)),
+               pg_get_indexdef(c.oid)
+        FROM pg_class c
+        WHERE c.relname = %s AND c.relkind = 'i'
+        """,
+        (index_name(method),),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return {
+        "index": index_name(method),
+        "size_bytes": row[0],
+        "size": row[1],
+        "definition": row[2],
+    }
+
+
+def create_vector_index(
+    method: str = VECTOR_INDEX_METHOD,
+    collection_name: str = "chunks",
+    concurrently: bool = True,
+) -> Dict[str, str]:
+    if method not in {"hnsw", "ivfflat"}:
+        raise ValueError(f"Unknown vector index method: {method}")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with get_connection(autocommit=True) as conn, conn.cursor() as cur:
+        ensure_vector_dims(cur)
+        n_rows = count_embeddings(cur, collection_name)
+
+        if method == "hnsw":
+            with_clause = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+        else:
+            with_clause = f"lists = {ivfflat_lists(n_rows)}"
+
+        # Built under a temporary name and swapped in, so queries keep using
+        # the old index while the new one builds and no step locks the table.
+        name = index_name(method)
+        build_name = f"{name}_build"
+        keyword = "CONCURRENTLY" if concurrently else ""
+
+        # SET LOCAL needs a transaction, so the session setting is reset by hand
+        cur.execute(f"SET maintenance_work_mem = '{INDEX_BUILD_MEM}'")
+        try:
+            # a failed concurrent build leaves an INVALID index behind
+            cur.execute(f"DROP INDEX {keyword} IF EXISTS {build_name}")
+
+            start = time.perf_counter()
+            cur.execute(
+                f"""
+                CREATE INDEX {keyword} {build_name}
+                ON langchain_pg_embedding USING {method} (embedding {OPCLASS})
+                WITH ({with_clause})
+                """
+            )
+            build_seconds = time.perf_counter() - start
+        finally:
+            cur.execute("RESET maintenance_work_mem")
+
+        cur.execute(f"DROP INDEX {keyword} IF EXISTS {name}")
+        cur.execute(f"ALTER INDEX {build_name} RENAME TO {name}")
+
+        cur.execute("ANALYZE langchain_pg_embedding")
+        report = index_report(cur, method)
+        report.update({"rows": n_rows, "build_seconds": round(build_seconds, 3)})
+
+    print(f"Built {report['index']} over {n_rows} rows in "
+          f"{report['build_seconds']}s ({report['size']})")
+    return report
+
+
+def rebuild_vector_index(method: str = VECTOR_INDEX_METHOD) -> Dict[str, str]:
+    """Rebuild the index in place, e.g. after a large ingest.
+
+    IVFFlat centroids are fixed at build time, so the list count is recomputed
+    from the current row count by recreating the index instead of REINDEX.
+    """
+    if method == "ivfflat":
+        return create_vector_index(method)
+
+    with get_connection(autocommit=True) as conn, conn.cursor() as cur:
+        cur.execute(f"SET maintenance_work_mem = '{INDEX_BUILD_MEM}'")
+        try:
+            start = time.perf_counter()
+            cur.execute(f"REINDEX INDEX CONCURRENTLY {index_name(method)}")
+            build_seconds = time.perf_counter() - start
+        finally:
+            cur.execute("RESET maintenance_work_mem")
+
+        report = index_report(cur, method)
+        report["build_seconds"] = round(build_seconds, 3)
+
+    print(f"Rebuilt {report['index']} in {report['build_seconds']}s ({report['size']})")
+    return report
+
+
+def drop_vector_index(method: str = VECTOR_INDEX_METHOD) -> None:
+    with get_connection(autocommit=True) as conn, conn.cursor() as cur:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(method)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the ANN index on langchain_pg_embedding")
+    parser.add_argument("action", choices=["create", "rebuild", "drop", "report", "migrate"])
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default=VECTOR_INDEX_METHOD)
+    args = parser.parse_args()
+
+    if args.action == "create":
+        create_vector_index(args.method)
+    elif args.action == "rebuild":
+        rebuild_vector_index(args.method)
+    elif args.action == "drop":
+        drop_vector_index(args.method)
+    elif args.action == "migrate":
+        migrate_vector_dims()
+        migrate_fulltext_column()
+    else:
+        with get_connection() as conn, conn.cursor() as cur:
+            print(index_report(cur, args.method))
@@ -0,0 +1,292 @@
+import os
+import io
+import csv
+import json
+import uuid
+import time
+import threading
+import argparse
+from pathlib import Path
+from queue import Queue
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from langchain_core.documents import Document
+
+from src.boardgame_agents.rag.model_registry import get_embeddings
+from src.boardgame_agents.rag.instrumentation import ingest_timings
+from src.boardgame_agents.rag.db_utils import get_connection
+
+from chunking import chunk_pdf
+from db_insertion import (
+    diff_chunks,
+    apply_chunk_diff,
+    EMBED_MODEL,
+)
+
+load_env = load_dotenv()
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+INGEST_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", "ingest_checkpoint.json")
+
+# (page_content, metadata) pairs are cheap to pickle between processes
+Chunk = Tuple[str, Dict]
+# (doc_name, chunks to embed, stale ids, chunks with only new metadata)
+DocumentDiff = Tuple[str, List[Document], List[str], List[Document]]
+
+
+def extract_and_split(pdf_path: str, creator: str) -> Tuple[str, List[Chunk], float]:
+    """Runs in a worker process: pdfminer parsing and splitting are CPU bound.
+
+    The elapsed time is returned so the parent can record it.
+    """
+    start = time.perf_counter()
+    doc_name = Path(pdf_path).stem
+    chunks = chunk_pdf(pdf_path, doc_name, creator)
+
+    return (doc_name, [(c.page_content, c.metadata) for c in chunks],
+            time.perf_counter() - start)
+
+
+def source_stamp(pdf_path: str) -> Dict[str, float]:
+    stat = os.stat(pdf_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class IngestCheckpoint:
+    """Documents fully committed by an interrupted run, persisted after each one.
+
+    Entries hold the PDF's size and mtime, so a re-downloaded or edited file
+    is ingested again; the file is removed once a run finishes cleanly.
+    """
+
+    def __init__(self, path: str = INGEST_CHECKPOINT):
+        self.path = Path(path)
+        self.done: Dict[str, Dict[str, float]] = {}
+        if self.path.exists():
+            done = json.loads(self.path.read_text())["done"]
+            # older checkpoints only listed names and can't tell changed files apart
+            self.done = done if isinstance(done, dict) else {}
+
+    def is_done(self, pdf_path: str) -> bool:
+        return self.done.get(Path(pdf_path).stem) == source_stamp(pdf_path)
+
+    def mark_done(self, doc_name: str, stamp: Dict[str, float]) -> None:
+        self.done[doc_name] = stamp
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"done": self.done}))
+        # atomic, so an interrupted run never leaves a truncated checkpoint
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        self.done = {}
+        self.path.unlink(missing_ok=True)
+
+
+def get_or_create_collection(cur, collection_name: str = "chunks") -> str:
+    cur.execute(
+        "SELECT uuid FROM langchain_pg_collection WHERE name = %s",
+        (collection_name,),
+    )
+    if row := cur.fetchone():
+        return str(row[0])
+
+    collection_id = str(uuid.uuid4())
+    cur.execute(
+        "INSERT INTO langchain_pg_collection (uuid, name, cmetadata) VALUES (%s, %s, %s)",
+        (collection_id, collection_name, json.dumps(None)),
+    )
+    return collection_id
+
+
+def copy_chunks(cur, collection_id: str, chunks: List[Document], vectors: List[List[float]]) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for chunk, vector in zip(chunks, vectors):
+        writer.writerow([
+            chunk.id,
+            collection_id,
+            "[" + ",".join(map(str, vector)) + "]",
+            chunk.page_content,
+            json.dumps(chunk.metadata),
+        ])
+    buf.seek(0)
+
+    cur.copy_expert(
+        """
+        COPY langchain_pg_embedding (id, collection_id, embedding, document, cmetadata)
+        FROM STDIN WITH (FORMAT csv)
+        """,
+        buf,
+    )
+
+
+class BulkIngestor:
+    """Extract -> embed -> COPY pipeline for many rulebook PDFs.
+
+    Page extraction runs in a process pool, a single embedding thread batches
+    chunks across documents, and a writer thread COPYs each finished document
+    in its own transaction before recording it in the checkpoint. Documents
+    already in the database are diffed on chunk content hashes, so only
+    changed chunks are embedded.
+    """
+
+    def __init__(
+        self,
+        workers: int = INGEST_WORKERS,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        checkpoint_path: str = INGEST_CHECKPOINT,
+        collection_name: str = "chunks",
+    ):
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.checkpoint = IngestCheckpoint(checkpoint_path)
+        self.collection_name = collection_name
+        self.embeddings = get_embeddings(
+            EMBED_MODEL, encode_kwargs={"batch_size": embed_batch_size})
+
+        # bounded queues give backpressure when one stage falls behind
+        self._embed_queue: "Queue[Optional[DocumentDiff]]" = Queue(maxsize=workers * 2)
+        self._write_queue: "Queue[Optional[Tuple[DocumentDiff, List]]]" = Queue(maxsize=8)
+        self._errors: List[Exception] = []
+        self._stamps: Dict[str, Dict[str, float]] = {}
+        # set once the writer has consumed the end-of-stream sentinel
+        self._write_done = False
+
+    def _embed_worker(self) -> None:
+        pending: List[DocumentDiff] = []
+        n_pending = 0
+
+        def flush():
+            nonlocal pending, n_pending
+            if not pending:
+                return
+            texts = [c.page_content for diff in pending for c in diff[1]]
+            try:
+                with ingest_timings.time("embed"):
+                    vectors = self.embeddings.embed_documents(texts) if texts else []
+            except Exception as e:
+                # the documents stay out of the checkpoint and are retried next run
+                self._errors.append(e)
+                print(f"Failed to embed {[diff[0] for diff in pending]} ({e})")
+                pending, n_pending = [], 0
+                return
+            offset = 0
+            for diff in pending:
+                n = len(diff[1])
+                self._write_queue.put((diff, vectors[offset: offset + n]))
+                offset += n
+            pending, n_pending = [], 0
+
+        while (item := self._embed_queue.get()) is not None:
+            pending.append(item)
+            n_pending += len(item[1])
+            if n_pending >= self.embed_batch_size:
+                flush()
+        flush()
+        self._write_queue.put(None)
+
+    def _write_worker(self) -> None:
+        self._write_done = False
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    collection_id = get_or_create_collection(cur, self.collection_name)
+                conn.commit()
+                self._write_loop(conn, collection_id)
+        except Exception as e:
+            self._errors.append(e)
+            print(f"Database writer failed ({e})")
+            # keep draining so the upstream stages can shut down, unless the
+            # sentinel was already consumed and nothing else will arrive
+            while not self._write_done and self._write_queue.get() is not None:
+                pass
+
+    def _write_loop(self, conn, collection_id: str) -> None:
+        while (item := self._write_queue.get()) is not None:
+            (doc_name, new, stale, moved), vectors = item
+            try:
+                with ingest_timings.time("write"), conn.cursor() as cur:
+                    if new:
+                        copy_chunks(cur, collection_id, new, vectors)
+                    apply_chunk_diff(cur, stale, moved, self.collection_name)
+                    conn.commit()
+                self.checkpoint.mark_done(doc_name, self._stamps[doc_name])
+                print(f"Inserted {doc_name} ({len(new)} new, {len(moved)} moved, "
+                      f"{len(stale)} removed chunks)")
+            except Exception as e:
+                conn.rollback()
+                self._errors.append(e)
+                print(f"Failed to insert {doc_name} ({e})")
+        self._write_done = True
+
+    def ingest(self, pdfs: List[Tuple[str, str]]) -> List[str]:
+        """Ingest (pdf_path, creator) pairs, skipping checkpointed documents."""
+        todo = [(p, c) for p, c in pdfs if not self.checkpoint.is_done(p)]
+        print(f"{len(pdfs) - len(todo)} documents already ingested, {len(todo)} to go")
+        # taken before extraction, so a file changed mid-run is redone next time
+        self._stamps = {Path(p).stem: source_stamp(p) for p, _ in todo}
+        self._errors = []
+
+        embedder = threading.Thread(target=self._embed_worker, daemon=True)
+        writer = threading.Thread(target=self._write_worker, daemon=True)
+        embedder.start()
+        writer.start()
+
+        try:
+            # read-only connection for diffing against already stored chunks
+            with get_connection() as conn, ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(extract_and_split, p, c): p for p, c in todo}
+                for future in as_completed(futures):
+                    try:
+                        doc_name, chunks, seconds = future.result()
+                    except Exception as e:
+                        self._errors.append(e)
+                        print(f"Failed to parse {futures[future]} ({e})")
+                        continue
+                    ingest_timings.record("extract", seconds)
+                    if not chunks:
+                        continue
+
+                    docs = [Document(page_content=t, metadata=m) for t, m in chunks]
+                    with ingest_timings.time("diff"), conn.cursor() as cur:
+                        new, stale, moved = diff_chunks(
+                            cur, doc_name, docs, collection_name=self.collection_name)
+                    conn.rollback()
+                    self._embed_queue.put((doc_name, new, stale, moved))
+        finally:
+            self._embed_queue.put(None)
+            embedder.join()
+            writer.join()
+
+        for stage, summary in ingest_timings.summary().items():
+            print(f"{stage}: {summary}")
+        done = sorted(self.checkpoint.done)
+        # the checkpoint only exists to resume a crashed or failed run
+        if not self._errors:
+            self.checkpoint.clear()
+        return done
+
+
+def ingest_directory(pdf_dir: str, creator: str = "unknown", **kwargs) -> List[str]:
+    pdfs = [(str(p), creator) for p in sorted(Path(pdf_dir).glob("*.pdf"))]
+    return BulkIngestor(**kwargs).ingest(pdfs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk ingest rulebook PDFs into PGVector")
+    parser.add_argument("pdf_dir")
+    parser.add_argument("--creator", default="unknown")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--checkpoint", default=INGEST_CHECKPOINT)
+    args = parser.parse_args()
+
+    ingest_directory(
+        args.pdf_dir,
+        creator=args.creator,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+    )
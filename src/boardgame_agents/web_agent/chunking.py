@@ -0,0 +1,167 @@
+import os
+import re
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from page_cache import iter_pages
+
+from src.boardgame_agents.rag.model_registry import get_tokenizer
+
+load_env = load_dotenv()
+
+EMBED_MODEL = os.getenv(
+    "EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# all-MiniLM-L6-v2 truncates its input at 256 word pieces
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+HEADING_SIZE_RATIO = float(os.getenv("HEADING_SIZE_RATIO", "1.15"))
+
+NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*|[IVX]+)[.)]?\s+\S")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def is_heading(block: Dict, body_size: float) -> bool:
+    text = block["text"].strip()
+    words = text.split()
+    if not words or len(words) > 12 or "\n" in text or text.endswith((".", ",", ";")):
+        return False
+    if body_size and block["size"] >= body_size * HEADING_SIZE_RATIO:
+        return True
+    return bool(NUMBERED_HEADING.match(text)) or (text.isupper() and len(text) > 3)
+
+
+class LayoutChunker:
+    """Splits rulebook pages on headings, sized by the embedding tokenizer.
+
+    Blocks are the pdfminer text containers cached by `page_cache`. A heading
+    starts a new chunk and is repeated at the top of its continuation chunks;
+    chunks never exceed `max_tokens` (special tokens included), and each
+    chunk's token count is stored in its metadata.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        tokenizer_name: str = EMBED_MODEL,
+    ):
+        self.tokenizer = get_tokenizer(tokenizer_name)
+        # room for [CLS] / [SEP]
+        self.budget = max_tokens - self.tokenizer.num_special_tokens_to_add()
+        self.overlap_tokens = overlap_tokens
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _split_long(self, text: str, budget: int) -> List[Tuple[str, int]]:
+        """Sentence-pack a block that is too long on its own, with token counts.
+
+        Each sentence is tokenized once and the counts are summed, one token
+        per joining space, so a piece's count never undershoots re-tokenizing it.
+        """
+        pieces: List[Tuple[str, int]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for sentence in SENTENCE_END.split(text):
+            ids = self.tokenizer.encode(sentence, add_special_tokens=False)
+            if not ids:
+                continue
+            if current and current_tokens + 1 + len(ids) > budget:
+                pieces.append((" ".join(current), current_tokens))
+                current, current_tokens = [], 0
+            if len(ids) > budget:
+                # a single run-on sentence: cut on token boundaries
+                while len(ids) > budget:
+                    pieces.append((self.tokenizer.decode(ids[:budget]), budget))
+                    ids = ids[budget:]
+                if not ids:
+                    continue
+                sentence = self.tokenizer.decode(ids)
+            current_tokens += len(ids) + (1 if current else 0)
+            current.append(sentence)
+        if current:
+            pieces.append((" ".join(current), current_tokens))
+        return pieces
+
+    def split(self, pages: List[Dict], doc_name: str, creator: str) -> List[Document]:
+        sizes = [b["size"] for p in pages for b in p["blocks"] if b["size"]]
+        body_size = median(sizes) if sizes else 0.0
+
+        chunks: List[Document] = []
+        section: Optional[str] = None
+        parts: List[str] = []
+        part_tokens: List[int] = []
+        first_page = last_page = None
+
+        def header() -> str:
+            return f"{section}\n" if section else ""
+
+        def flush(keep_overlap: bool):
+            nonlocal parts, part_tokens, first_page
+            if not parts:
+                return
+            text = header() + "\n".join(parts)
+            chunks.append(Document(
+                page_content=text,
+                metadata={
+                    "document_name": doc_name,
+                    "source": doc_name,
+                    "creator": creator,
+                    "page": first_page,
+                    "page_end": last_page,
+                    "section": section,
+                    "token_count": self.count(text)
+                    + self.tokenizer.num_special_tokens_to_add(),
+                },
+            ))
+
+            kept, kept_tokens = [], []
+            if keep_overlap:
+                # carry trailing blocks of the same section into the next chunk
+                total = 0
+                for part, n in zip(reversed(parts), reversed(part_tokens)):
+                    if total + n > self.overlap_tokens:
+                        break
+                    kept.insert(0, part)
+                    kept_tokens.insert(0, n)
+                    total += n
+            parts, part_tokens = kept, kept_tokens
+            first_page = last_page if kept else None
+
+        for page in pages:
+            for block in page["blocks"]:
+                if is_heading(block, body_size):
+                    flush(keep_overlap=False)
+                    section = block["text"].strip()
+                    continue
+
+                budget = self.budget - self.count(header())
+                for piece, n in self._split_long(block["text"], budget):
+                    if parts and sum(part_tokens) + n + len(parts) > budget:
+                        flush(keep_overlap=True)
+                        while parts and sum(part_tokens) + n + len(parts) > budget:
+                            parts.pop(0)
+                            part_tokens.pop(0)
+                        if not parts:
+                            first_page = None
+                    if first_page is None:
+                        first_page = page["page"]
+                    last_page = page["page"]
+                    parts.append(piece)
+                    part_tokens.append(n)
+
+        flush(keep_overlap=False)
+        return chunks
+
+
+_chunker: Optional[LayoutChunker] = None
+
+
+def chunk_pdf(pdf_path, doc_name: str, creator: str) -> List[Document]:
+    global _chunker
+    if _chunker is None:
+        _chunker = LayoutChunker()
+    return _chunker.split(list(iter_pages(pdf_path)), doc_name, creator)
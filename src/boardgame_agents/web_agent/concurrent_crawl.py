@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import asyncio
+import uuid
+import shutil
+import hashlib
+import argparse
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import pandas as pd
+from dotenv import load_dotenv
+from langgraph.graph import StateGraph, START, END
+
+from main_web_agent import State, llm
+from prompts_templates_web import get_rules_evaluation_message, BoardGameEvaluation
+from web_crawler import extract_text_from_pdf, HTTP_TIMEOUT, DOWNLOAD_CHUNK_SIZE
+from db_insertion import documents_exist
+from bulk_ingest import BulkIngestor
+from rulebook_classifier import classify_pdf, route_after_classification, stats as classifier_stats
+
+load_env = load_dotenv()
+
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "8"))
+CRAWL_HOST_INTERVAL = float(os.getenv("CRAWL_HOST_INTERVAL", "0.5"))
+CRAWL_CACHE_DIR = os.getenv("CRAWL_CACHE_DIR", ".crawl_cache")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(7 * 24 * 3600)))
+SEARCH_URL = os.getenv("SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+# same policy as web_crawler.build_session; the transport only retries connect errors
+CRAWL_RETRIES = int(os.getenv("CRAWL_RETRIES", "3"))
+CRAWL_BACKOFF = float(os.getenv("CRAWL_BACKOFF", "0.5"))
+CRAWL_MAX_RETRY_DELAY = float(os.getenv("CRAWL_MAX_RETRY_DELAY", "60"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def retry_delay(headers: httpx.Headers, attempt: int) -> float:
+    """Seconds to wait before retrying, from Retry-After or exponential backoff."""
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), CRAWL_MAX_RETRY_DELAY)
+    return min(CRAWL_BACKOFF * 2 ** attempt, CRAWL_MAX_RETRY_DELAY)
+
+
+class FetchCache:
+    """On-disk cache of HTTP bodies keyed by URL, revalidated with ETag/Last-Modified."""
+
+    def __init__(self, cache_dir: str = CRAWL_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.body", self.cache_dir / f"{key}.json"
+
+    def get(self, url: str) -> Tuple[Optional[Path], Dict]:
+        body, meta = self._paths(url)
+        if not body.exists() or not meta.exists():
+            return None, {}
+        return body, json.loads(meta.read_text())
+
+    def part_path(self, url: str) -> Path:
+        # unique per download, so concurrent fetches of one URL never share a file
+        return self._paths(url)[0].with_suffix(f".{uuid.uuid4().hex}.part")
+
+    def _write_meta(self, meta: Path, data: Dict) -> None:
+        tmp = meta.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, meta)
+
+    def commit(self, url: str, part: Path, headers: httpx.Headers) -> Path:
+        """Move a fully streamed `part` into place and record its validators."""
+        body, meta = self._paths(url)
+        os.replace(part, body)
+        self._write_meta(meta, {
+            "url": url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fetched_at": time.time(),
+        })
+        return body
+
+    def touch(self, url: str) -> None:
+        _, meta = self._paths(url)
+        data = json.loads(meta.read_text())
+        data["fetched_at"] = time.time()
+        self._write_meta(meta, data)
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least `interval` seconds apart."""
+
+    def __init__(self, interval: float = CRAWL_HOST_INTERVAL):
+        self.interval = interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncCrawler:
+    """Pooled async HTTP client with per-host rate limits and a fetch cache."""
+
+    def __init__(
+        self,
+        max_connections: int = CRAWL_WORKERS * 2,
+        host_interval: float = CRAWL_HOST_INTERVAL,
+        cache_dir: str = CRAWL_CACHE_DIR,
+        search_url: str = SEARCH_URL,
+    ):
+        self.client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=2),
+        )
+        self.limiter = HostRateLimiter(host_interval)
+        self.cache = FetchCache(cache_dir)
+        self.search_url = search_url
+        self.cache_hits = 0
+        self.requests = 0
+
+    async def fetch(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        max_age: Optional[float] = None,
+        secret_params: Optional[Dict] = None,
+    ) -> Path:
+        """Return the path to the cached body of `url`, fetching it when needed.
+
+        Entries younger than `max_age` are used without a request; older ones
+        are revalidated with a conditional GET. `secret_params` (API keys) are
+        sent with the request but kept out of the cache key and metadata.
+        429 and 5xx responses are retried with backoff, honouring Retry-After.
+        """
+        full_url = str(httpx.URL(url, params=params))
+        request_url = httpx.URL(full_url).copy_merge_params(secret_params) \
+            if secret_params else full_url
+        body, meta = self.cache.get(full_url)
+
+        if body is not None and max_age is not None \
+                and time.time() - meta.get("fetched_at", 0) < max_age:
+            self.cache_hits += 1
+            return body
+
+        headers = {}
+        if body is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        for attempt in range(CRAWL_RETRIES + 1):
+            await self.limiter.wait(full_url)
+            self.requests += 1
+            async with self.client.stream("GET", request_url, headers=headers) as r:
+                if r.status_code in RETRY_STATUSES and attempt < CRAWL_RETRIES:
+                    delay = retry_delay(r.headers, attempt)
+                    print(f"HTTP {r.status_code} for {full_url}, retrying in {delay:.1f}s")
+                else:
+                    return await self._store(full_url, body, r)
+            await asyncio.sleep(delay)
+
+    async def _store(self, full_url: str, body: Optional[Path], r: httpx.Response) -> Path:
+        if r.status_code == 304 and body is not None:
+            self.cache_hits += 1
+            self.cache.touch(full_url)
+            return body
+
+        if r.is_error:
+            # name the cache URL so secret params stay out of the logs too
+            raise httpx.HTTPStatusError(
+                f"HTTP {r.status_code} for {full_url}", request=r.request, response=r)
+        # stream to disk instead of holding whole PDFs in memory
+        part = self.cache.part_path(full_url)
+        try:
+            with open(part, "wb") as f:
+                async for chunk in r.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        return self.cache.commit(full_url, part, r.headers)
+
+    async def search(self, search_term: str, postfix: str = "board game rules pdf") -> List[str]:
+        params = {
+            "cx": os.getenv("GOOGLE_CX_KEY"),
+            "q": f"{search_term} {postfix}",
+            "num": 5,
+        }
+        body = await self.fetch(
+            self.search_url, params=params, max_age=SEARCH_CACHE_TTL,
+            secret_params={"key": os.getenv("GOOGLE_API_KEY")})
+        items = json.loads(body.read_bytes()).get("items", [])
+        return [item["link"] for item in items if item["link"].lower().endswith(".pdf")]
+
+    async def download_pdf(self, url: str, search_term: str, save_dir: str = "pdfs") -> Path:
+        body = await self.fetch(url)
+        save_dir = Path(save_dir)
+        save_dir.mkdir(parents=True, exist_ok=True)
+        filename = save_dir.joinpath(f"{search_term}.pdf")
+        # skip the copy when the cached PDF is unchanged, keeping its sidecar valid
+        if not filename.exists() or filename.stat().st_size != body.stat().st_size \
+                or filename.stat().st_mtime < body.stat().st_mtime:
+            shutil.copyfile(body, filename)
+        return filename
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def build_crawl_graph(crawler: AsyncCrawler):
+    """Async twin of main_web_agent.graph: search -> download -> classify -> evaluate."""
+
+    async def google_search(state):
+        game_name = state.get("game_name", "")
+        for url in await crawler.search(game_name):
+            try:
+                pdf_path = await crawler.download_pdf(url, game_name)
+            except httpx.HTTPError as e:
+                print(f"Failed: {url} ({e})")
+                continue
+            # pdfminer and the tokenizer are CPU bound
+            pdf_text = await asyncio.to_thread(extract_text_from_pdf, pdf_path)
+            return {"pdf_text": pdf_text}
+        return {"pdf_text": None}
+
+    async def analyze_pdf(state):
+        game_name = state.get("game_name", "")
+        pdf_text = state.get("pdf_text", "")
+        if not pdf_text:
+            return {"structured_output": None}
+        messages = get_rules_evaluation_message(game_name, pdf_text)
+        structured_llm = llm.with_structured_output(BoardGameEvaluation)
+        structured_output = await structured_llm.ainvoke(messages)
+        return {"structured_output": structured_output}
+
+    builder = StateGraph(State)
+    builder.add_node("google_search", google_search)
+    builder.add_node("classify_pdf", classify_pdf)
+    builder.add_node("analyze_pdf", analyze_pdf)
+    builder.add_edge(START, "google_search")
+    builder.add_edge("google_search", "classify_pdf")
+    builder.add_conditional_edges(
+        "classify_pdf",
+        route_after_classification,
+        {"analyze_pdf": "analyze_pdf", "end": END},
+    )
+    builder.add_edge("analyze_pdf", END)
+    return builder.compile()
+
+
+async def crawl_games(game_names: List[str], max_workers: int = CRAWL_WORKERS) -> List[Tuple[str, str]]:
+    """Run the crawl graph for many games at once.
+
+    Returns (pdf_path, creator) pairs for the PDFs judged to be rulebooks.
+    """
+    crawler = AsyncCrawler(max_connections=max_workers * 2)
+    graph = build_crawl_graph(crawler)
+    semaphore = asyncio.Semaphore(max_workers)
+    accepted: List[Tuple[str, str]] = []
+
+    async def crawl_one(game_name: str):
+        async with semaphore:
+            try:
+                final_state = await graph.ainvoke(
+                    {"game_name": game_name, "pdf_text": None,
+                     "classification": None, "structured_output": None})
+            except Exception as e:
+                print(f"Failed: {game_name} ({e})")
+                return
+        structured_output = final_state.get("structured_output")
+        if structured_output and structured_output.rules:
+            accepted.append((f"pdfs/{game_name}.pdf", structured_output.creator))
+            print(f"{game_name}: rulebook found")
+        else:
+            print(f"{game_name}: no rulebook found")
+
+    try:
+        await asyncio.gather(*(crawl_one(g) for g in game_names))
+    finally:
+        await crawler.aclose()
+
+    print(f"Crawled {len(game_names)} games with {crawler.requests} requests "
+          f"({crawler.cache_hits} served from cache)")
+    print(f"Rulebook classifier: {classifier_stats.summary()}")
+    return accepted
+
+
+def run_concurrent_web_agent(csv_name, board_game_name_column, max_workers: int = CRAWL_WORKERS):
+    game_names = pd.read_csv(csv_name)[board_game_name_column].to_list()
+    existing = documents_exist(game_names)
+    game_names = [g for g in game_names if g not in existing]
+
+    accepted = asyncio.run(crawl_games(game_names, max_workers=max_workers))
+    if accepted:
+        BulkIngestor().ingest(accepted)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl rulebooks for many games concurrently")
+    parser.add_argument("csv_name")
+    parser.add_argument("--column", default="board_game_name")
+    parser.add_argument("--workers", type=int, default=CRAWL_WORKERS)
+    args = parser.parse_args()
+
+    run_concurrent_web_agent(args.csv_name, args.column, max_workers=args.workers)
@@ -3,107 +3,150 @@ from pathlib import Path
 import uuid
 import hashlib
 import re
-from typing import List
+import json
+from typing import Dict, List, Tuple
 
 
 from langchain_community.document_loaders import PDFPlumberLoader
 from dotenv import load_dotenv
 from langchain_postgres import PGVector
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-import psycopg2
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer
+
+from chunking import chunk_pdf
+
+from src.boardgame_agents.rag.model_registry import get_embeddings
+from src.boardgame_agents.rag.instrumentation import ingest_timings
+from src.boardgame_agents.rag.db_utils import documents_exist, get_connection, get_engine
 
 load_env = load_dotenv()
 
 
-PG_DSN = os.getenv("DB_DSN", "")
 EMBED_MODEL = os.getenv(
     "EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")  # 384 dims
-CHUNK_MAX_WORDS = int(os.getenv("CHUNK_MAX_WORDS", "220"))
-CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "60"))
-
-
-def extract_pages_with_numbers(pdf_path, doc_name, creator):
-    docs = []
-
-    for page_idx, layout in enumerate(extract_pages(pdf_path)):
-        page_text = []
-
-        for element in layout:
-            if isinstance(element, LTTextContainer):
-                if txt := element.get_text().strip():
-                    page_text.append(txt)
-
-        full_text = "\n".join(page_text)
-        if not full_text.strip():
-            continue
-
-        docs.append(
-            Document(
-                page_content=full_text,
-                metadata={
-                    "document_name": doc_name,
-                    "source": doc_name,
-                    "creator": creator,
-                    "page": page_idx + 1,
-                },
-            )
-        )
 
-    return docs
 
+def chunk_id(doc_name: str, content: str, collection_name: str = "chunks") -> str:
+    """Deterministic row id, so re-ingesting the same chunk hits the same row.
 
-def process_and_insert_pdf(pdf_path: str, creator: str):
-    doc_name = Path(pdf_path).stem
+    The collection is part of the hash, since ids are unique across the table
+    and the same rulebook may be stored in several collections.
+    """
+    key = f"{collection_name}\x00{doc_name}\x00{content}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return str(uuid.UUID(digest[:32]))
 
-    pages = extract_pages_with_numbers(pdf_path, doc_name, creator)
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800, chunk_overlap=150)
-    chunks = splitter.split_documents(pages)
+def assign_chunk_ids(
+    doc_name: str, chunks: List[Document], collection_name: str = "chunks"
+) -> List[Document]:
+    unique: Dict[str, Document] = {}
+    for chunk in chunks:
+        chunk.id = chunk_id(doc_name, chunk.page_content, collection_name)
+        # identical text twice in one rulebook is stored once
+        unique.setdefault(chunk.id, chunk)
+    return list(unique.values())
+
+
+def stored_chunk_metadata(cur, doc_name: str, collection_name: str = "chunks") -> Dict[str, dict]:
+    cur.execute("""
+        SELECT e.id, e.cmetadata
+        FROM langchain_pg_embedding e
+        JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+        WHERE c.name = %(collection)s
+          AND e.cmetadata @> %(filter)s::jsonb;
+    """, {"collection": collection_name, "filter": json.dumps({"document_name": doc_name})})
+    return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def diff_chunks(
+    cur,
+    doc_name: str,
+    chunks: List[Document],
+    incremental: bool = True,
+    collection_name: str = "chunks",
+) -> Tuple[List[Document], List[str], List[Document]]:
+    """Split a document's chunks into (to embed, stale ids, metadata-only updates).
+
+    Chunks are matched on their content hash, so unchanged text is never
+    re-embedded; chunks that only moved (e.g. to another page) get their
+    metadata updated in place.
+    """
+    chunks = assign_chunk_ids(doc_name, chunks, collection_name)
+    stored = stored_chunk_metadata(cur, doc_name, collection_name)
+    current = {c.id for c in chunks}
+    stale = [i for i in stored if i not in current]
+
+    if not incremental:
+        # everything is re-embedded and upserted over the existing rows
+        return chunks, stale, []
+
+    new = [c for c in chunks if c.id not in stored]
+    moved = [c for c in chunks if c.id in stored and stored[c.id] != c.metadata]
+    return new, stale, moved
+
+
+_IN_COLLECTION = """
+    collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = %(collection)s)
+"""
+
+
+def apply_chunk_diff(
+    cur, stale: List[str], moved: List[Document], collection_name: str = "chunks"
+) -> None:
+    if stale:
+        cur.execute(
+            f"DELETE FROM langchain_pg_embedding WHERE id = ANY(%(ids)s) AND {_IN_COLLECTION};",
+            {"ids": stale, "collection": collection_name},
+        )
+    for chunk in moved:
+        cur.execute(
+            "UPDATE langchain_pg_embedding SET cmetadata = %(metadata)s::jsonb "
+            f"WHERE id = %(id)s AND {_IN_COLLECTION};",
+            {"metadata": json.dumps(chunk.metadata), "id": chunk.id, "collection": collection_name},
+        )
 
-    embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
 
-    vs = PGVector.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        collection_name="chunks",
-        connection=PG_DSN
-    )
+def process_and_insert_pdf(
+    pdf_path: str, creator: str, incremental: bool = True, collection_name: str = "chunks"
+):
+    doc_name = Path(pdf_path).stem
 
-    print(f"Inserted {doc_name} by {creator} in the database")
+    # heading-aware chunks sized to the embedding model's token limit
+    with ingest_timings.time("chunk"):
+        chunks = chunk_pdf(pdf_path, doc_name, creator)
 
+    with ingest_timings.time("diff"):
+        with get_connection() as conn, conn.cursor() as cur:
+            new, stale, moved = diff_chunks(cur, doc_name, chunks, incremental, collection_name)
 
-def document_exists_sql(doc_name: str) -> bool:
-    conn = psycopg2.connect(PG_DSN)
-    cur = conn.cursor()
+    if new:
+        embeddings = get_embeddings(EMBED_MODEL)
 
-    cur.execute("""
-        SELECT 1 FROM langchain_pg_embedding
-        WHERE cmetadata->>'document_name' = %s
-        LIMIT 1;
-    """, (doc_name,))
+        vs = PGVector(
+            embeddings=embeddings,
+            collection_name=collection_name,
+            connection=get_engine()
+        )
+        with ingest_timings.time("embed_insert"):
+            vs.add_documents(new, ids=[c.id for c in new])
 
-    exists = cur.fetchone() is not None
+    # stale rows go only after the replacements are in
+    with ingest_timings.time("apply_diff"):
+        with get_connection() as conn, conn.cursor() as cur:
+            apply_chunk_diff(cur, stale, moved, collection_name)
 
-    cur.close()
-    conn.close()
-    return exists
+    print(f"Inserted {doc_name} by {creator} in the database "
+          f"({len(new)} new, {len(moved)} moved, {len(stale)} removed chunks)")
 
 
-def wipe_langchain_pg():
-    conn = psycopg2.connect(PG_DSN)
-    cur = conn.cursor()
+def document_exists_sql(doc_name: str) -> bool:
+    return doc_name in documents_exist([doc_name])
 
-    cur.execute("TRUNCATE TABLE langchain_pg_embedding CASCADE;")
-    cur.execute("TRUNCATE TABLE langchain_pg_collection CASCADE;")
 
-    conn.commit()
-    cur.close()
-    conn.close()
+def wipe_langchain_pg():
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE TABLE langchain_pg_embedding CASCADE;")
+        cur.execute("TRUNCATE TABLE langchain_pg_collection CASCADE;")
 
     print("Resetted langchain db")
 
@@ -5,7 +5,8 @@ from langchain.chat_models import init_chat_model
 from typing_extensions import TypedDict
 from web_crawler import query_google
 from prompts_templates_web import get_rules_evaluation_message, BoardGameEvaluation
-from db_insertion import process_and_insert_pdf, document_exists_sql
+from db_insertion import process_and_insert_pdf, documents_exist
+from rulebook_classifier import classify_pdf, route_after_classification, stats as classifier_stats
 from langchain_qwq import ChatQwen
 import os
 from langchain_openai import ChatOpenAI
@@ -25,6 +26,7 @@ class State(TypedDict):
     # messages: Annotated[List, add_messages]
     game_name: str | None
     pdf_text: str | None
+    classification: str | None
     structured_output: BoardGameEvaluation | None
 
 
@@ -48,10 +50,17 @@ def analyze_pdf(state):
 graph_builder = StateGraph(State)
 
 graph_builder.add_node("google_search", google_search)
+graph_builder.add_node("classify_pdf", classify_pdf)
 graph_builder.add_node("analyze_pdf", analyze_pdf)
 
 graph_builder.add_edge(START, end_key="google_search")
-graph_builder.add_edge(start_key="google_search", end_key="analyze_pdf")
+graph_builder.add_edge(start_key="google_search", end_key="classify_pdf")
+# only ambiguous PDFs reach the LLM
+graph_builder.add_conditional_edges(
+    "classify_pdf",
+    route_after_classification,
+    {"analyze_pdf": "analyze_pdf", "end": END},
+)
 
 graph_builder.add_edge(start_key="analyze_pdf", end_key=END)
 
@@ -60,16 +69,23 @@ graph = graph_builder.compile()
 
 def run_web_agent(csv_name, board_game_name_column):
     game_names = pd.read_csv(csv_name)[board_game_name_column].to_list()
+    existing = documents_exist(game_names)
     for game_name in game_names:
         state = {"game_name": game_name,
                  "pdf_text": None,
                  "boardgame_evaluation": None}
 
-        if document_exists_sql(game_name):
+        if game_name in existing:
             print(f"{game_name} already exists, skipping...")
             continue
 
-        final_state = graph.invoke(state)
+        try:
+            final_state = graph.invoke(state)
+        except RuntimeError as e:
+            # a failed search only loses this game, not the rest of the csv
+            print(f"Skipping {game_name}: {e}")
+            print("-" * 80)
+            continue
 
         if structured_output := final_state.get("structured_output", ""):
             pass
@@ -81,6 +97,8 @@ def run_web_agent(csv_name, board_game_name_column):
                 pdf_path=pdf_path, creator=structured_output.creator)
         print("-" * 80)
 
+    print(f"Rulebook classifier: {classifier_stats.summary()}")
+
 
 if __name__ == "__main__":
     csv_name = r"C:\board_game_rag\rag_test.csv"
@@ -0,0 +1,95 @@
+import os
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTChar, LTTextContainer
+
+
+SIDECAR_SUFFIX = ".pages.json"
+# bumped whenever the page format changes so old sidecars are re-parsed
+SIDECAR_VERSION = 2
+
+
+def sidecar_path(pdf_path) -> Path:
+    pdf_path = Path(pdf_path)
+    return pdf_path.with_name(pdf_path.name + SIDECAR_SUFFIX)
+
+
+def _source_stamp(pdf_path) -> Dict[str, float]:
+    stat = os.stat(pdf_path)
+    return {
+        "version": SIDECAR_VERSION,
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+    }
+
+
+def _load_sidecar(pdf_path) -> Dict:
+    path = sidecar_path(pdf_path)
+    if path.exists():
+        data = json.loads(path.read_text(encoding="utf-8"))
+        # a re-downloaded PDF invalidates what was extracted from the old one
+        if all(data.get(k) == v for k, v in _source_stamp(pdf_path).items()):
+            return data
+    return {**_source_stamp(pdf_path), "complete": False, "pages": []}
+
+
+def _save_sidecar(pdf_path, data: Dict) -> None:
+    path = sidecar_path(pdf_path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _chars(element) -> Iterator[LTChar]:
+    for obj in element:
+        if isinstance(obj, LTChar):
+            yield obj
+        elif isinstance(obj, LTTextContainer):
+            yield from _chars(obj)
+
+
+def _font_size(element) -> float:
+    sizes = [char.size for char in _chars(element)]
+    return round(sum(sizes) / len(sizes), 2) if sizes else 0.0
+
+
+def _parse_page(layout, page_number: int) -> Dict:
+    blocks: List[Dict] = []
+    for element in layout:
+        if isinstance(element, LTTextContainer):
+            if txt := element.get_text().strip():
+                # font size lets the chunker tell headings from body text
+                blocks.append({"text": txt, "size": _font_size(element)})
+    return {"page": page_number, "blocks": blocks}
+
+
+def iter_pages(pdf_path) -> Iterator[Dict]:
+    """Yield {"page", "blocks": [{"text", "size"}]} per page, parsing each page at most once.
+
+    Pages already in the sidecar are replayed from it; parsing resumes after
+    the last cached page and stops as soon as the caller stops iterating, so
+    reading only the first few pages never parses the rest of the file.
+    """
+    data = _load_sidecar(pdf_path)
+    yield from data["pages"]
+    if data["complete"]:
+        return
+
+    start = len(data["pages"])
+    completed = False
+    try:
+        for layout in extract_pages(pdf_path, page_numbers=range(start, 10**7)):
+            page = _parse_page(layout, len(data["pages"]) + 1)
+            data["pages"].append(page)
+            yield page
+        completed = True
+    finally:
+        data["complete"] = completed
+        _save_sidecar(pdf_path, data)
+
+
+def page_text(page: Dict) -> str:
+    return "\n".join(block["text"] for block in page["blocks"])
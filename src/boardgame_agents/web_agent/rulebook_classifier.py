@@ -0,0 +1,154 @@
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from prompts_templates_web import BoardGameEvaluation
+
+
+CLASSIFIER_ACCEPT_SCORE = float(os.getenv("CLASSIFIER_ACCEPT_SCORE", "12"))
+CLASSIFIER_REJECT_SCORE = float(os.getenv("CLASSIFIER_REJECT_SCORE", "3"))
+CLASSIFIER_MIN_WORDS = int(os.getenv("CLASSIFIER_MIN_WORDS", "150"))
+
+ACCEPT = "accept"
+REJECT = "reject"
+AMBIGUOUS = "ambiguous"
+
+# vocabulary that shows up in almost every rulebook
+RULEBOOK_TERMS = [
+    "setup", "set up", "components", "game components", "contents", "rules",
+    "rulebook", "players", "each player", "your turn", "on your turn",
+    "turn order", "round", "phase", "victory points", "end of the game",
+    "game end", "winner", "wins the game", "draw", "discard", "deck",
+    "cards", "tokens", "dice", "board", "starting player", "overview",
+    "objective", "example",
+]
+# sections a rulebook is structured around, matched as heading-like lines
+SECTION_HEADINGS = re.compile(
+    r"^\s*(\d+[.)]?\s*)?(setup|set-up|game setup|components|contents|"
+    r"overview|objective|object of the game|how to play|playing the game|"
+    r"game turn|turn overview|end of (the )?game|game end|scoring|winning)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+NON_RULEBOOK_TERMS = [
+    "abstract", "references", "journal", "thesis", "invoice", "order number",
+    "shipping", "price list", "catalog", "press release", "privacy policy",
+    "terms and conditions",
+]
+# keywords match in any case, the name itself must be capitalised
+CREATOR_PATTERN = re.compile(
+    r"(?i:game design(?:ed)?(?: by)?|designed by|designer|design)\s*[:\-]?\s*"
+    r"([A-Z][\w.'-]+(?:\s+[A-Z][\w.'-]+){0,3})"
+)
+# covers of expansions name the base game too, so leave those to the LLM
+EXPANSION_TERMS = ["expansion", "expansions", "promo"]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _count(terms, text: str) -> int:
+    return sum(len(re.findall(rf"\b{re.escape(t)}\b", text)) for t in terms)
+
+
+def score_rulebook(game_name: str, pdf_text: str) -> Dict[str, float]:
+    text = _normalize(pdf_text)
+    n_words = max(len(text.split()), 1)
+    per_1k = 1000 / n_words
+
+    rule_hits = _count(RULEBOOK_TERMS, text) * per_1k
+    sections = len({m.group(2).lower() for m in SECTION_HEADINGS.finditer(pdf_text)})
+    negative_hits = _count(NON_RULEBOOK_TERMS, text) * per_1k
+
+    # the title usually sits on the cover page
+    cover = text[:3000]
+    name = _normalize(game_name) if game_name else ""
+    name_on_cover = bool(name) and re.search(rf"\b{re.escape(name)}\b", cover) is not None
+    expansion_on_cover = _count(EXPANSION_TERMS, cover) > _count(EXPANSION_TERMS, name)
+
+    score = rule_hits + 2 * sections - 3 * negative_hits
+    return {
+        "words": n_words,
+        "rule_terms_per_1k": round(rule_hits, 2),
+        "sections": sections,
+        "negative_terms_per_1k": round(negative_hits, 2),
+        "name_on_cover": name_on_cover,
+        "expansion_on_cover": expansion_on_cover,
+        "score": round(score, 2),
+    }
+
+
+def guess_creator(pdf_text: str) -> str:
+    if match := CREATOR_PATTERN.search(pdf_text[:20000]):
+        return match.group(1).strip()
+    return "unknown"
+
+
+def classify_rulebook(game_name: str, pdf_text: Optional[str]) -> Tuple[str, Dict[str, float]]:
+    """Cheap first-stage decision: ACCEPT, REJECT or AMBIGUOUS (ask the LLM)."""
+    if not pdf_text:
+        return REJECT, {}
+
+    features = score_rulebook(game_name, pdf_text)
+    if features["words"] < CLASSIFIER_MIN_WORDS:
+        return REJECT, features
+    if features["score"] < CLASSIFIER_REJECT_SCORE:
+        return REJECT, features
+    if features["score"] >= CLASSIFIER_ACCEPT_SCORE and features["name_on_cover"] \
+            and not features["expansion_on_cover"]:
+        return ACCEPT, features
+    return AMBIGUOUS, features
+
+
+class ClassifierStats:
+    """Counts of first-stage decisions and the LLM calls they saved."""
+
+    def __init__(self):
+        self.counts = {ACCEPT: 0, REJECT: 0, AMBIGUOUS: 0}
+        self._lock = threading.Lock()
+
+    def record(self, decision: str) -> None:
+        with self._lock:
+            self.counts[decision] += 1
+
+    def summary(self) -> Dict[str, float]:
+        total = sum(self.counts.values())
+        avoided = self.counts[ACCEPT] + self.counts[REJECT]
+        return {
+            **self.counts,
+            "total": total,
+            "llm_calls": self.counts[AMBIGUOUS],
+            "llm_calls_avoided": avoided,
+            "avoided_ratio": avoided / total if total else 0.0,
+        }
+
+
+stats = ClassifierStats()
+
+
+def classify_pdf(state):
+    """LangGraph node; decided cases get their BoardGameEvaluation here."""
+    game_name = state.get("game_name", "")
+    pdf_text = state.get("pdf_text")
+
+    decision, features = classify_rulebook(game_name, pdf_text)
+    stats.record(decision)
+    print(f"{game_name}: classifier says {decision} {features}")
+
+    if decision == ACCEPT:
+        return {
+            "classification": decision,
+            "structured_output": BoardGameEvaluation(
+                rules=True, creator=guess_creator(pdf_text)),
+        }
+    if decision == REJECT:
+        return {
+            "classification": decision,
+            "structured_output": BoardGameEvaluation(rules=False, creator="unknown"),
+        }
+    return {"classification": decision}
+
+
+def route_after_classification(state) -> str:
+    return "analyze_pdf" if state.get("classification") == AMBIGUOUS else "end"
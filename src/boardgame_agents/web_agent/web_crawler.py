@@ -1,13 +1,39 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import os
 from pathlib import Path
-from pdfminer.high_level import extract_text
-from transformers import AutoTokenizer
+
+from page_cache import iter_pages, page_text
+
+from src.boardgame_agents.rag.model_registry import get_tokenizer
 
 
 load_dotenv()
 
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def build_session(retries: int = 3, pool_size: int = 10) -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size,
+                          pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# shared so connections are reused across searches and downloads
+session = build_session()
+
 
 def query_google(search_term, postfix="board game rules pdf"):
     API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -23,9 +49,10 @@ def query_google(search_term, postfix="board game rules pdf"):
     }
 
     try:
-        r = requests.get(base_url, params=params)
+        r = session.get(base_url, params=params, timeout=HTTP_TIMEOUT)
+        r.raise_for_status()
     except Exception as e:
-        raise (f"{e}")
+        raise RuntimeError(f"Search failed for {search_term} ({e})") from e
 
     results = r.json().get("items", [])
 
@@ -42,22 +69,32 @@ def save_pdf(url, search_term, save_dir="pdfs"):
 
     if url.lower().endswith(".pdf"):
         filename = save_dir.joinpath(f"{search_term}.pdf")
+        tmp = filename.with_suffix(".pdf.part")
         try:
-            r = requests.get(url, timeout=15)
-            r.raise_for_status()
-            with open(filename, "wb") as f:
-                f.write(r.content)
+            with session.get(url, timeout=HTTP_TIMEOUT, stream=True) as r:
+                r.raise_for_status()
+                with open(tmp, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            os.replace(tmp, filename)
             return extract_text_from_pdf(filename)
             # print(f"Downloaded {filename}")
         except Exception as e:
+            tmp.unlink(missing_ok=True)
             print(f"Failed: {url} ({e})")
 
 
 def extract_text_from_pdf(pdf_path, max_tokens=5000):
-    tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-7B-Instruct")
-    text = extract_text(pdf_path)
-
-    tokens = tokenizer.encode(text)
+    tokenizer = get_tokenizer("Qwen/Qwen2.5-7B-Instruct")
+
+    # stop parsing once enough tokens are collected; parsed pages are kept in
+    # the sidecar cache for ingestion
+    tokens = []
+    for page in iter_pages(pdf_path):
+        if text := page_text(page):
+            tokens.extend(tokenizer.encode(text + "\n\n"))
+        if len(tokens) >= max_tokens:
+            break
 
     tokens = tokens[:max_tokens]
 
@@ -1,9 +1,30 @@
-from src.boardgame_agents.rag.rag_oop import RAGService, ChatResponse
+import time
+
+_import_start = time.perf_counter()
+
+# heavy modules (langchain, torch, sentence-transformers) are imported by
+# load_service, after the app is already answering /health
+from src.boardgame_agents.rag.schemas import ChatResponse
+from src.boardgame_agents.rag.model_registry import MODEL_WARMUP, warm_up, model_stats
+from src.boardgame_agents.rag.instrumentation import render_prometheus, request_span
+import os
+import json
+import asyncio
+import importlib
 import uvicorn
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
+if TYPE_CHECKING:
+    from src.boardgame_agents.rag.rag_oop import RAGService
+
+# "background": serve immediately and load in a task, "blocking": load before serving
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+STARTUP_MODELS = MODEL_WARMUP or "embeddings,cross_encoder"
+
 router = APIRouter(
     prefix="/boardgame_rag",
     tags=["Dashboard"],
@@ -11,17 +32,72 @@ router = APIRouter(
 )
 
 
-rag_service: RAGService | None = None
+rag_service: Optional["RAGService"] = None
+startup: Dict[str, Any] = {"status": "starting", "error": None, "report": {}}
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+def _timed(phase: str, fn: Callable, *args) -> Any:
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        startup["report"][f"{phase}_seconds"] = round(time.perf_counter() - start, 3)
+
+
+async def check_database() -> None:
+    from sqlalchemy import text
+    from src.boardgame_agents.rag.db_utils import get_async_engine
+
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def load_service() -> None:
+    """Import, load models, connect and build the service, timing each phase."""
     global rag_service
+    start = time.perf_counter()
+    try:
+        rag_oop = await asyncio.to_thread(
+            _timed, "import", importlib.import_module, "src.boardgame_agents.rag.rag_oop")
+        await asyncio.to_thread(_timed, "model_load", warm_up, STARTUP_MODELS)
+
+        # on the serving loop, so the pooled connection is reused by requests
+        db_start = time.perf_counter()
+        await check_database()
+        startup["report"]["db_connect_seconds"] = round(time.perf_counter() - db_start, 3)
+
+        service = await asyncio.to_thread(_timed, "service_init", rag_oop.RAGService)
+        await asyncio.to_thread(_timed, "chain_warmup", service.warm_up)
+
+        rag_service = service
+        startup["status"] = "ready"
+    except Exception as e:
+        startup["status"] = "failed"
+        startup["error"] = repr(e)
+        print(f"RAG service failed to start ({e!r})")
+    startup["report"]["ready_after_seconds"] = round(time.perf_counter() - start, 3)
+    print(f"Startup {startup['status']}: {startup['report']}")
+
+
+def require_service() -> "RAGService":
+    if rag_service is None:
+        raise HTTPException(
+            status_code=503, detail=f"RAG service is {startup['status']}")
+    return rag_service
 
-    rag_service = RAGService()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loader = None
+    if STARTUP_MODE == "blocking":
+        await load_service()
+    else:
+        loader = asyncio.create_task(load_service())
 
     yield
-    pass
+
+    if loader is not None:
+        loader.cancel()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -35,38 +111,132 @@ app.add_middleware(
 )
 
 
-@router.get("/chat", response_model=ChatResponse)
-def chat_endpoint(user_input: str = Query(...)) -> ChatResponse:
-    if rag_service is None:
-        raise HTTPException(
-            status_code=500, detail="RAG service not initialized"
-        )
+def route_label(request: Request) -> str:
+    # route templates keep the label set bounded; 404s and scanners share one
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # streamed responses are timed up to their first byte; the router sets
+    # scope["route"] during call_next, so the label is read afterwards
+    with request_span(lambda: route_label(request)):
+        return await call_next(request)
+
 
-    answer = rag_service.chat(
-        user_id=None,
-        user_input=user_input
+@router.get("/chat", response_model=ChatResponse)
+async def chat_endpoint(
+    user_input: str = Query(...),
+    game_name: str = Query(...),
+    user_id: str | None = Query(None),
+) -> ChatResponse:
+    answer = await require_service().chat(
+        user_id=user_id,
+        user_input=user_input,
+        game_name=game_name,
     )
 
     return ChatResponse(answer=answer)
 
 
+@router.get("/chat/stream")
+async def chat_stream_endpoint(
+    user_input: str = Query(...),
+    game_name: str = Query(...),
+    user_id: str | None = Query(None),
+) -> StreamingResponse:
+    service = require_service()
+
+    async def event_stream():
+        async for token in service.stream_chat(
+            user_id=user_id,
+            user_input=user_input,
+            game_name=game_name,
+        ):
+            # JSON-encode so newlines in tokens don't break SSE framing
+            yield f"data: {json.dumps(token)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch")
+async def batch_endpoint(request: Request) -> StreamingResponse:
+    """JSONL of {"game", "question"} in, NDJSON answers out as they finish."""
+    service = require_service()
+    from src.boardgame_agents.rag.batch_qa import parse_jsonl
+
+    body = (await request.body()).decode("utf-8")
+    try:
+        items = parse_jsonl(body.splitlines())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def results():
+        stream = service.batch_qa.run(items)
+        try:
+            async for result in stream:
+                yield json.dumps(result) + "\n"
+        finally:
+            # a client that disconnects cancels the answers still in flight
+            await stream.aclose()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @router.post("/add_game")
 def add_game_to_context_endpoint(user_input: str) -> ChatResponse:
-    if rag_service is None:
-        raise HTTPException(
-            status_code=500, detail="RAG service not initialized")
-
-    rag_service.add_game_to_context(game_name="Catan")
+    require_service().add_game_to_context(game_name=user_input)
     # return ChatResponse(answer=answer)
 
 
+@router.get("/cache_stats")
+def cache_stats_endpoint():
+    service = require_service()
+    return {
+        "answer_cache": service.answer_cache.stats(),
+        "stages": service.timings.summary(),
+    }
+
+
+@router.get("/model_stats")
+def model_stats_endpoint():
+    return model_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    gauges = {}
+    if rag_service is not None:
+        gauges.update({
+            f"rag_answer_cache_{k}": v
+            for k, v in rag_service.answer_cache.stats().items()
+        })
+    return render_prometheus(gauges)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    body = {"status": startup["status"], "startup": startup["report"]}
+    if startup["error"]:
+        body["error"] = startup["error"]
+    return JSONResponse(body, status_code=200 if rag_service is not None else 503)
+
+
 app.include_router(router)
 
+startup["report"]["main_import_seconds"] = round(time.perf_counter() - _import_start, 3)
+
 
 if __name__ == "__main__":
     uvicorn.run("src.main:app", host="127.0.0.1", port=8080, reload=True)
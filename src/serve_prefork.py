@@ -0,0 +1,221 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import traceback
+from typing import Dict, List, Optional
+
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PREFORK_HOST = os.getenv("PREFORK_HOST", "127.0.0.1")
+PREFORK_PORT = int(os.getenv("PREFORK_PORT", "8080"))
+# seconds between memory reports, 0 to only report once workers are up
+PREFORK_REPORT_INTERVAL = float(os.getenv("PREFORK_REPORT_INTERVAL", "300"))
+# restarts back off exponentially; a worker that lived PREFORK_HEALTHY_SECONDS
+# resets its count, and PREFORK_MAX_FAILURES quick failures stop the server
+PREFORK_RESTART_BACKOFF = float(os.getenv("PREFORK_RESTART_BACKOFF", "1"))
+PREFORK_RESTART_BACKOFF_MAX = float(os.getenv("PREFORK_RESTART_BACKOFF_MAX", "60"))
+PREFORK_HEALTHY_SECONDS = float(os.getenv("PREFORK_HEALTHY_SECONDS", "60"))
+PREFORK_MAX_FAILURES = int(os.getenv("PREFORK_MAX_FAILURES", "5"))
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def smaps_rollup(pid) -> Dict[str, int]:
+    """Memory of one process in bytes, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in SMAPS_FIELDS:
+                values[key] = int(rest.split()[0]) * 1024
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "unique": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def memory_report(workers: List[int]) -> None:
+    mib = 1024 * 1024
+    rows = [("parent", os.getpid())] + [(f"worker {i}", pid) for i, pid in enumerate(workers)]
+    total_pss = 0
+    for name, pid in rows:
+        try:
+            m = smaps_rollup(pid)
+        except OSError:
+            continue
+        total_pss += m["pss"]
+        print(f"{name} (pid {pid}): rss={m['rss'] / mib:.0f}MiB "
+              f"unique={m['unique'] / mib:.0f}MiB shared={m['shared'] / mib:.0f}MiB "
+              f"pss={m['pss'] / mib:.0f}MiB")
+    # PSS splits shared pages between their users, so it sums to the real footprint
+    print(f"total pss: {total_pss / mib:.0f}MiB")
+
+
+def load_in_parent(threads: int):
+    """Import the app and load the models once, before any fork."""
+    # torch sizes its pools from these when it is first imported
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import importlib
+    import src.main as app_module
+    from src.boardgame_agents.rag.model_registry import registry, warm_up
+
+    importlib.import_module("src.boardgame_agents.rag.rag_oop")
+    # loading only; no forward pass here, OpenMP thread pools don't survive fork
+    warm_up(app_module.STARTUP_MODELS)
+    registry.freeze()
+    return app_module.app
+
+
+def run_worker(app, sock: socket.socket, threads: int) -> None:
+    import torch
+    import uvicorn
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed by an earlier parallel call
+
+    # DB pools, rerank threads and the event loop are all created here, per worker
+    config = uvicorn.Config(app, log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    if not server.started:
+        raise RuntimeError("uvicorn worker failed to start")
+
+
+def spawn(app, sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(app, sock, threads)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            # os._exit skips the interpreter's flush at shutdown
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    return pid
+
+
+def serve(workers: int = PREFORK_WORKERS, host: str = PREFORK_HOST, port: int = PREFORK_PORT) -> None:
+    threads = threads_per_worker(workers)
+    start = time.perf_counter()
+    app = load_in_parent(threads)
+    print(f"Loaded models in {time.perf_counter() - start:.2f}s, "
+          f"forking {workers} workers with {threads} torch threads each")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # objects that exist now are never collected, so the collector doesn't
+    # write to their headers and un-share the pages holding them
+    gc.collect()
+    gc.freeze()
+
+    # one slot per worker; a dead worker's slot waits in restart_at for its backoff
+    pids: List[Optional[int]] = [spawn(app, sock, threads) for _ in range(workers)]
+    started = [time.monotonic()] * workers
+    failures = [0] * workers
+    restart_at: List[Optional[float]] = [None] * workers
+    stopping = False
+    exit_code = 0
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            if pid is None:
+                continue
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    reported_at = time.monotonic()
+    first_report = True
+    while any(pid is not None for pid in pids) or (
+        not stopping and any(at is not None for at in restart_at)
+    ):
+        pid, status = os.waitpid(-1, os.WNOHANG) if any(p is not None for p in pids) else (0, 0)
+        now = time.monotonic()
+        if pid:
+            if pid not in pids:
+                continue
+            index = pids.index(pid)
+            pids[index] = None
+            if stopping:
+                continue
+
+            if now - started[index] >= PREFORK_HEALTHY_SECONDS:
+                failures[index] = 0
+            failures[index] += 1
+            code = os.waitstatus_to_exitcode(status)
+            if failures[index] > PREFORK_MAX_FAILURES:
+                print(f"Worker {pid} exited with code {code}, {PREFORK_MAX_FAILURES} restarts "
+                      f"in a row failed, shutting down")
+                exit_code = 1
+                stop(None, None)
+                continue
+            delay = min(PREFORK_RESTART_BACKOFF * 2 ** (failures[index] - 1),
+                        PREFORK_RESTART_BACKOFF_MAX)
+            print(f"Worker {pid} exited with code {code}, restarting in {delay:.1f}s")
+            restart_at[index] = now + delay
+            continue
+
+        for index, at in enumerate(restart_at):
+            if at is not None and now >= at and not stopping:
+                pids[index] = spawn(app, sock, threads)
+                started[index] = now
+                restart_at[index] = None
+
+        # the first report waits for workers to finish their own startup
+        if (first_report and now - reported_at > 30) or (
+            PREFORK_REPORT_INTERVAL and now - reported_at > PREFORK_REPORT_INTERVAL
+        ):
+            if not stopping:
+                memory_report([pid for pid in pids if pid is not None])
+            first_report = False
+            reported_at = now
+        time.sleep(0.5)
+
+    sock.close()
+    if exit_code:
+        sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API from forked workers sharing one copy of the models")
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    parser.add_argument("--host", default=PREFORK_HOST)
+    parser.add_argument("--port", type=int, default=PREFORK_PORT)
+    args = parser.parse_args()
+
+    if sys.platform != "linux":
+        sys.exit("serve_prefork needs fork() and /proc; use uvicorn on this platform")
+    serve(args.workers, args.host, args.port)